@@ -1,30 +1,56 @@
 from __future__ import annotations
 
-from datetime import timedelta
+import asyncio
+from collections.abc import AsyncIterator
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
 
 from app.api.schemas import (
     AssetOut,
+    BatchPresignRequest,
+    BatchPresignResponse,
+    BulkIngestRequest,
+    HarvestRequest,
+    HarvestResponse,
     IngestRequest,
     IngestResponse,
     JobResponse,
+    JobStatusRequest,
+    LocalSearchHit,
+    LocalSearchResponse,
+    RecordListResponse,
     RecordResponse,
+    RecordSummary,
     SearchRequest,
     SearchResponse,
     SearchHit,
+    PresignResponse,
     LinkOut,
+    QueryIngestRequest,
+    RecordErrorOut,
 )
-from app.db.models import Asset, Job, JobItem, Link, Record
-from app.db.session import get_db
-from app.dnb.marc import parse_marcxml_record
-from app.dnb.sru_client import SruClient
+from app.db.bulk import insert_ingest_job, upsert_parsed_records
+from app.db.listing import InvalidCursor, RecordFilters, decode_cursor, encode_cursor, list_records
+from app.db.models import Asset, Harvest, Job, JobItem, Link, Record
+from app.db.progress import StatusChange, apply_status_changes
+from app.db.search import search_records
+from app.db.session import SessionLocal, get_db
+from app.dnb.marc import parse_marc_records
+from app.dnb.sru_client import SruClient, SruSearchResult
+from app.ingest.blobs import release_blob
+from app.ingest.presign import presign_object
 from app.ingest.storage import get_minio_client
+from app.core import metrics
+from app.core.profiling import ProfilingRoute, check_token, in_thread, profile_path, task_headers
 from app.core.config import settings
-from app.worker.celery_app import celery_app
+from app.worker.celery_app import celery_app, send_asset_batch
 
-router = APIRouter()
+# Sync endpoints run on the threadpool; ProfilingRoute includes them in request profiles.
+router = APIRouter(route_class=ProfilingRoute)
 
 
 @router.get("/health")
@@ -32,82 +58,159 @@ def health() -> dict:
     return {"status": "ok"}
 
 
-@router.post("/search", response_model=SearchResponse)
-def search(req: SearchRequest, db: Session = Depends(get_db)) -> SearchResponse:
-    # Run SRU query (async client) from sync endpoint: use anyio via httpx? We'll use asyncio.run safely.
-    import asyncio
-
-    async def _run():
-        return await SruClient().search(
-            req.cql,
-            start_record=req.start_record,
-            maximum_records=req.maximum_records,
-            record_schema="MARC21-xml",
-        )
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics() -> Response:
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
 
-    try:
-        res = asyncio.run(_run())
-    except RuntimeError:
-        # If running in existing loop (unlikely in uvicorn sync), fallback:
-        res = asyncio.get_event_loop().run_until_complete(_run())
-
-    hits: list[SearchHit] = []
-
-    for marcxml in res.records:
-        try:
-            parsed = parse_marcxml_record(marcxml)
-        except Exception:
-            continue
-
-        # Upsert record
-        rec = db.get(Record, parsed.idn)
-        if rec is None:
-            rec = Record(idn=parsed.idn, title=parsed.title, year=parsed.year, raw_marcxml=parsed.raw_marcxml)
-            db.add(rec)
-        else:
-            rec.title = parsed.title
-            rec.year = parsed.year
-            rec.raw_marcxml = parsed.raw_marcxml
-
-        db.flush()
-
-        # Upsert links (unique by record_idn + url)
-        link_count = 0
-        for l in parsed.links:
-            existing = (
-                db.query(Link)
-                .filter(Link.record_idn == parsed.idn)
-                .filter(Link.url == l.url)
-                .one_or_none()
-            )
-            if existing is None:
-                db.add(
-                    Link(
-                        record_idn=parsed.idn,
-                        url=l.url,
-                        label=l.label,
-                        description=l.description,
-                        kind=l.kind,
-                    )
-                )
-            else:
-                existing.label = l.label
-                existing.description = l.description
-                existing.kind = l.kind
-            link_count += 1
-
-        hits.append(
+
+@router.get("/debug/profiles/{profile_id}", include_in_schema=False)
+def get_profile(profile_id: str, x_profile_token: str | None = Header(default=None)) -> FileResponse:
+    if not check_token(x_profile_token):
+        raise HTTPException(status_code=403, detail="Profiling requires a valid X-Profile-Token")
+    path = profile_path(profile_id)
+    if path is None or not path.is_file():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    # Open it at https://www.speedscope.app or with `pyinstrument --load`.
+    return FileResponse(path, media_type="application/json", filename=profile_id)
+
+
+def get_sru_client(request: Request) -> SruClient:
+    return request.app.state.sru_client
+
+
+@in_thread
+def _store_search_page(db: Session, res: SruSearchResult) -> SearchResponse:
+    parsed_records, errors = parse_marc_records(res.records)
+    upsert_parsed_records(db, parsed_records)
+    db.commit()
+
+    return SearchResponse(
+        number_of_records=res.number_of_records,
+        hits=[
             SearchHit(
                 idn=parsed.idn,
                 title=parsed.title,
                 year=parsed.year,
                 creators=parsed.creators,
-                links_count=link_count,
+                links_count=len(parsed.links),
             )
-        )
+            for parsed in parsed_records
+        ],
+        errors=[RecordErrorOut(position=res.start_record + e.position, error=e.error) for e in errors],
+    )
+
+
+@router.post("/search", response_model=SearchResponse)
+async def search(
+    req: SearchRequest,
+    db: Session = Depends(get_db),
+    sru: SruClient = Depends(get_sru_client),
+) -> SearchResponse:
+    res = await sru.search(
+        req.cql,
+        start_record=req.start_record,
+        maximum_records=req.maximum_records,
+        record_schema="MARC21-xml",
+    )
+
+    # Parsing and the (sync) DB session stay off the event loop.
+    return await run_in_threadpool(_store_search_page, db, res)
+
+
+def _harvest_out(harvest: Harvest) -> HarvestResponse:
+    return HarvestResponse(
+        id=harvest.id,
+        cql=harvest.cql,
+        status=harvest.status,
+        max_records=harvest.max_records,
+        number_of_records=harvest.number_of_records,
+        records_harvested=harvest.records_harvested,
+        records_failed=harvest.records_failed,
+        records_per_sec=harvest.records_per_sec,
+        error=harvest.error,
+    )
+
 
+@router.post("/harvests", response_model=HarvestResponse)
+def create_harvest(req: HarvestRequest, db: Session = Depends(get_db)) -> HarvestResponse:
+    harvest = Harvest(
+        cql=req.cql,
+        max_records=req.max_records,
+        status="queued",
+        records_harvested=0,
+        records_failed=0,
+    )
+    db.add(harvest)
     db.commit()
-    return SearchResponse(number_of_records=res.number_of_records, hits=hits)
+
+    celery_app.send_task("harvest_query", args=[harvest.id])
+    return _harvest_out(harvest)
+
+
+@router.get("/harvests/{harvest_id}", response_model=HarvestResponse)
+def get_harvest(harvest_id: str, db: Session = Depends(get_db)) -> HarvestResponse:
+    harvest = db.get(Harvest, harvest_id)
+    if harvest is None:
+        raise HTTPException(status_code=404, detail="Harvest not found")
+    return _harvest_out(harvest)
+
+
+@router.get("/sru/cache")
+def sru_cache_stats(sru: SruClient = Depends(get_sru_client)) -> dict:
+    if sru.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "entries": len(sru.cache), **sru.cache.stats.as_dict()}
+
+
+@router.get("/records", response_model=RecordListResponse)
+def list_stored_records(
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    year_min: int | None = None,
+    year_max: int | None = None,
+    link_kind: str | None = None,
+    asset_status: str | None = None,
+    db: Session = Depends(get_db),
+) -> RecordListResponse:
+    """Stored records ordered by year (unknown years last), then idn."""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    filters = RecordFilters(year_min=year_min, year_max=year_max, link_kind=link_kind, asset_status=asset_status)
+    records, next_after = list_records(db, filters, after=after, limit=limit)
+    return RecordListResponse(
+        items=[RecordSummary(idn=r.idn, title=r.title, year=r.year) for r in records],
+        next_cursor=encode_cursor(next_after) if next_after else None,
+    )
+
+
+@router.get("/records/search", response_model=LocalSearchResponse)
+def search_stored_records(
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10_000),
+    db: Session = Depends(get_db),
+) -> LocalSearchResponse:
+    """Ranked full-text search over stored titles, creators and link text; never calls SRU."""
+    hits, has_more = search_records(db, q, limit=limit, offset=offset)
+    return LocalSearchResponse(
+        items=[
+            LocalSearchHit(
+                idn=h.record.idn,
+                title=h.record.title,
+                year=h.record.year,
+                creators=h.record.creators or [],
+                rank=h.rank,
+            )
+            for h in hits
+        ],
+        next_offset=offset + limit if has_more else None,
+    )
 
 
 @router.get("/records/{idn}", response_model=RecordResponse)
@@ -127,7 +230,7 @@ def get_record(idn: str, db: Session = Depends(get_db)) -> RecordResponse:
         idn=rec.idn,
         title=rec.title,
         year=rec.year,
-        creators=[],  # We don't persist creators separately in MVP
+        creators=rec.creators or [],
         links=[
             LinkOut(id=l.id, url=l.url, label=l.label, description=l.description, kind=l.kind)
             for l in links
@@ -135,85 +238,207 @@ def get_record(idn: str, db: Session = Depends(get_db)) -> RecordResponse:
     )
 
 
+def _start_ingest_job(db: Session, link_ids: list[str]) -> IngestResponse:
+    job_id, assets = insert_ingest_job(db, link_ids)
+    db.commit()
+
+    # Enqueue downloads in batches; finalize_job completes the job once its
+    # counters show every asset done or failed.
+    asset_ids = [a["id"] for a in assets]
+    size = settings.ingest_batch_size
+    headers = task_headers()  # a profiled request gets its batches profiled too
+    for i in range(0, len(asset_ids), size):
+        send_asset_batch(asset_ids[i : i + size], headers=headers)
+    celery_app.send_task("finalize_job", args=[job_id], countdown=settings.job_finalize_poll_seconds)
+
+    return IngestResponse(
+        job_id=job_id,
+        assets=[AssetOut(id=a["id"], link_id=a["link_id"], status=a["status"]) for a in assets],
+    )
+
+
 @router.post("/records/{idn}/ingest", response_model=IngestResponse)
 def ingest_record(idn: str, req: IngestRequest, db: Session = Depends(get_db)) -> IngestResponse:
     rec = db.get(Record, idn)
     if rec is None:
         raise HTTPException(status_code=404, detail="Record not found")
 
-    q = db.query(Link).filter(Link.record_idn == idn)
+    q = select(Link.id).where(Link.record_idn == idn)
     if req.link_ids:
-        q = q.filter(Link.id.in_(req.link_ids))
-    links = q.all()
-    if not links:
+        q = q.where(Link.id.in_(req.link_ids))
+    link_ids = list(db.scalars(q))
+    if not link_ids:
         raise HTTPException(status_code=400, detail="No links selected")
 
-    job = Job(status="running")
-    db.add(job)
-    db.flush()
+    return _start_ingest_job(db, link_ids)
 
-    assets: list[Asset] = []
-    for link in links:
-        asset = Asset(link_id=link.id, status="queued")
-        db.add(asset)
-        db.flush()
-        db.add(JobItem(job_id=job.id, asset_id=asset.id))
-        assets.append(asset)
 
-    db.commit()
+@router.post("/ingest", response_model=IngestResponse)
+def ingest_records(req: BulkIngestRequest, db: Session = Depends(get_db)) -> IngestResponse:
+    """One job over the links of many records and/or individually selected links."""
+    link_ids: list[str] = []
+    if req.idns:
+        link_ids += db.scalars(select(Link.id).where(Link.record_idn.in_(req.idns)).order_by(Link.record_idn))
+    if req.link_ids:
+        link_ids += db.scalars(select(Link.id).where(Link.id.in_(req.link_ids)))
+    if not link_ids:
+        raise HTTPException(status_code=400, detail="No links selected")
 
-    # Enqueue downloads
-    for asset in assets:
-        celery_app.send_task("ingest_asset", args=[asset.id])
+    return _start_ingest_job(db, link_ids)
 
-    return IngestResponse(
-        job_id=job.id,
-        assets=[
-            AssetOut(
-                id=a.id,
-                link_id=a.link_id,
-                status=a.status,
-                storage_key=a.storage_key,
-                sha256=a.sha256,
-                mime_type=a.mime_type,
-                size_bytes=a.size_bytes,
-                error=a.error,
-            )
-            for a in assets
-        ],
+
+@router.post("/ingest/query", response_model=JobResponse)
+def ingest_query(req: QueryIngestRequest, db: Session = Depends(get_db)) -> JobResponse:
+    """Harvest a CQL query and ingest the matching links as one server-side job.
+
+    The worker runs harvest, persistence and download enqueueing as a
+    pipeline (``ingest_query`` task); the job grows while the harvest runs.
+    """
+    harvest = Harvest(
+        cql=req.cql,
+        max_records=req.max_records,
+        status="queued",
+        records_harvested=0,
+        records_failed=0,
     )
+    job = Job(status="running", harvest=harvest)
+    db.add(job)
+    db.commit()
+
+    celery_app.send_task("ingest_query", args=[job.id, list(dict.fromkeys(req.link_kinds))])
+    return _job_out(job)
+
+
+def _job_out(job: Job, asset_ids: list[str] | None = None) -> JobResponse:
+    return JobResponse(
+        id=job.id,
+        status=job.status,
+        total=job.total,
+        queued=job.queued,
+        downloading=job.downloading,
+        done=job.done,
+        failed=job.failed,
+        total_bytes=job.total_bytes,
+        asset_ids=asset_ids,
+        harvest=_harvest_out(job.harvest) if job.harvest_id is not None else None,
+    )
+
+
+def _load_job(job_id: str) -> JobResponse | None:
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        return None if job is None else _job_out(job)
+    finally:
+        db.close()
 
 
 @router.get("/jobs/{job_id}", response_model=JobResponse)
-def get_job(job_id: str, db: Session = Depends(get_db)) -> JobResponse:
+def get_job(job_id: str, include_assets: bool = False, db: Session = Depends(get_db)) -> JobResponse:
+    # Progress comes from the job's counters; completion is recorded by the
+    # finalize_job task. Listing asset ids is opt-in since it reads every item.
     job = db.get(Job, job_id)
     if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    asset_ids = [item.asset_id for item in job.items]
-    if asset_ids:
-        rows = db.query(Asset.status).filter(Asset.id.in_(asset_ids)).all()
-        statuses = [s for (s,) in rows]
-        if statuses and all(s in {"done", "failed"} for s in statuses):
-            if job.status != "completed":
-                job.status = "completed"
-                db.commit()
+    asset_ids = None
+    if include_assets:
+        asset_ids = list(db.scalars(select(JobItem.asset_id).where(JobItem.job_id == job_id)))
+    return _job_out(job, asset_ids)
 
-    return JobResponse(id=job.id, status=job.status, asset_ids=asset_ids)
 
+@router.post("/jobs/status", response_model=list[JobResponse])
+def get_jobs_status(req: JobStatusRequest, db: Session = Depends(get_db)) -> list[JobResponse]:
+    """Progress of many jobs in one query; unknown ids are left out."""
+    jobs = db.scalars(select(Job).options(selectinload(Job.harvest)).where(Job.id.in_(req.job_ids))).all()
+    return [_job_out(job) for job in jobs]
 
-@router.get("/assets/{asset_id}/presign")
-def presign_asset(asset_id: str, db: Session = Depends(get_db)) -> dict:
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request) -> StreamingResponse:
+    """Server-sent events: one ``progress`` event per change until the job completes.
+
+    The job row is re-read every ``job_events_poll_seconds`` (a primary-key
+    lookup); a comment line is sent every ``job_events_keepalive_seconds``
+    so proxies keep the connection open.
+    """
+    out = await run_in_threadpool(_load_job, job_id)
+    if out is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream() -> AsyncIterator[str]:
+        nonlocal out
+        last: JobResponse | None = None
+        idle = 0.0
+        while out is not None:
+            if out != last:
+                yield f"event: progress\ndata: {out.model_dump_json()}\n\n"
+                last, idle = out, 0.0
+            elif idle >= settings.job_events_keepalive_seconds:
+                yield ": keep-alive\n\n"
+                idle = 0.0
+            if out.status == "completed" or await request.is_disconnected():
+                return
+            await asyncio.sleep(settings.job_events_poll_seconds)
+            idle += settings.job_events_poll_seconds
+            out = await run_in_threadpool(_load_job, job_id)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete("/assets/{asset_id}", status_code=204, response_model=None)
+def delete_asset(asset_id: str, db: Session = Depends(get_db)) -> None:
+    asset = db.get(Asset, asset_id, with_for_update=True)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+
+    own_key = None
+    if asset.blob_sha256 is not None:
+        # Shared content-addressed blob: only drop our reference.
+        release_blob(db, asset)
+    else:
+        own_key = asset.storage_key
+
+    apply_status_changes(db, [StatusChange(asset.id, asset.status, None, asset.size_bytes)])
+    db.delete(asset)
+    db.commit()
+
+    if own_key:
+        get_minio_client().remove_object(settings.s3_bucket, own_key)
+
+
+def _presign_out(asset: Asset) -> PresignResponse:
+    signed = presign_object(asset.storage_key)
+    remaining = signed.expires_in_seconds()
+    return PresignResponse(
+        asset_id=asset.id,
+        url=signed.url,
+        expires_at=signed.expires_at,
+        expires_in_seconds=remaining,
+        expires_minutes=remaining // 60,
+    )
+
+
+@router.get("/assets/{asset_id}/presign", response_model=PresignResponse)
+def presign_asset(asset_id: str, db: Session = Depends(get_db)) -> PresignResponse:
     asset = db.get(Asset, asset_id)
     if asset is None:
         raise HTTPException(status_code=404, detail="Asset not found")
     if asset.status != "done" or not asset.storage_key:
         raise HTTPException(status_code=400, detail="Asset not available")
+    return _presign_out(asset)
+
 
-    client = get_minio_client()
-    url = client.presigned_get_object(
-        bucket_name=settings.s3_bucket,
-        object_name=asset.storage_key,
-        expires=timedelta(minutes=15),
+@router.post("/assets/presign", response_model=BatchPresignResponse)
+def presign_assets(req: BatchPresignRequest, db: Session = Depends(get_db)) -> BatchPresignResponse:
+    ids = list(dict.fromkeys(req.asset_ids))
+    rows = db.execute(select(Asset.id, Asset.status, Asset.storage_key).where(Asset.id.in_(ids))).all()
+    available = {r.id: r for r in rows if r.status == "done" and r.storage_key}
+    return BatchPresignResponse(
+        urls=[_presign_out(available[i]) for i in ids if i in available],
+        unavailable=[i for i in ids if i not in available],
     )
-    return {"url": url, "expires_minutes": 15}
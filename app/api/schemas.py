@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from datetime import datetime
 from typing import Literal
 
 from pydantic import BaseModel, Field, HttpUrl
@@ -27,9 +28,15 @@ class SearchHit(BaseModel):
     links_count: int = 0
 
 
+class RecordErrorOut(BaseModel):
+    position: int = Field(..., description="SRU record position within the result set")
+    error: str
+
+
 class SearchResponse(BaseModel):
     number_of_records: int
     hits: list[SearchHit]
+    errors: list[RecordErrorOut] = []
 
 
 class RecordResponse(BaseModel):
@@ -40,10 +47,39 @@ class RecordResponse(BaseModel):
     links: list[LinkOut] = []
 
 
+class RecordSummary(BaseModel):
+    idn: str
+    title: str | None = None
+    year: int | None = None
+
+
+class RecordListResponse(BaseModel):
+    items: list[RecordSummary]
+    next_cursor: str | None = Field(None, description="Pass as ?cursor= for the next page; null on the last page")
+
+
+class LocalSearchHit(BaseModel):
+    idn: str
+    title: str | None = None
+    year: int | None = None
+    creators: list[str] = []
+    rank: float
+
+
+class LocalSearchResponse(BaseModel):
+    items: list[LocalSearchHit]
+    next_offset: int | None = None
+
+
 class IngestRequest(BaseModel):
     link_ids: list[str] | None = Field(None, description="If omitted, ingest all links of the record")
 
 
+class BulkIngestRequest(BaseModel):
+    idns: list[str] = Field(default_factory=list, max_length=1000, description="Ingest all links of these records")
+    link_ids: list[str] = Field(default_factory=list, max_length=1000, description="Plus these individual links")
+
+
 class AssetOut(BaseModel):
     id: str
     link_id: str
@@ -55,6 +91,19 @@ class AssetOut(BaseModel):
     error: str | None = None
 
 
+LinkKind = Literal["toc", "dnb", "external"]  # as assigned by app.dnb.marc
+
+
+class QueryIngestRequest(BaseModel):
+    cql: str = Field(..., description="CQL query for DNB SRU")
+    max_records: int | None = Field(None, ge=1, description="If omitted, harvest the whole result set")
+    link_kinds: list[LinkKind] = Field(
+        default_factory=lambda: ["toc", "dnb", "external"],
+        min_length=1,
+        description="Ingest only links of these kinds",
+    )
+
+
 class IngestResponse(BaseModel):
     job_id: str
     assets: list[AssetOut]
@@ -63,4 +112,49 @@ class IngestResponse(BaseModel):
 class JobResponse(BaseModel):
     id: str
     status: Literal["running", "completed"] | str
-    asset_ids: list[str]
+    total: int = 0
+    queued: int = 0
+    downloading: int = 0
+    done: int = 0
+    failed: int = 0
+    total_bytes: int = 0
+    asset_ids: list[str] | None = None  # only with ?include_assets=true
+    harvest: HarvestResponse | None = None  # POST /ingest/query jobs: the harvest feeding the job
+
+
+class JobStatusRequest(BaseModel):
+    job_ids: list[str] = Field(..., min_length=1, max_length=500)
+
+
+class PresignResponse(BaseModel):
+    asset_id: str
+    url: str
+    expires_at: datetime
+    expires_in_seconds: int
+    expires_minutes: int  # kept for older clients; rounded down
+
+
+class BatchPresignRequest(BaseModel):
+    asset_ids: list[str] = Field(..., min_length=1, max_length=500)
+
+
+class BatchPresignResponse(BaseModel):
+    urls: list[PresignResponse]
+    unavailable: list[str]  # unknown ids and assets that are not downloaded (yet)
+
+
+class HarvestRequest(BaseModel):
+    cql: str = Field(..., description="CQL query for DNB SRU")
+    max_records: int | None = Field(None, ge=1, description="If omitted, harvest the whole result set")
+
+
+class HarvestResponse(BaseModel):
+    id: str
+    cql: str
+    status: Literal["queued", "running", "completed", "failed"] | str
+    max_records: int | None = None
+    number_of_records: int | None = None
+    records_harvested: int = 0
+    records_failed: int = 0
+    records_per_sec: float | None = None
+    error: str | None = None
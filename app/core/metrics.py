@@ -0,0 +1,192 @@
+"""Prometheus metrics for the API and the worker.
+
+Hot paths record into module-level histograms and counters defined here.
+The API serves them at ``GET /metrics``; a worker serves them on
+``WORKER_METRICS_PORT`` from its main process.
+
+With ``PROMETHEUS_MULTIPROC_DIR`` set, every process (uvicorn workers,
+Celery prefork children, MARC parse pool workers) writes its samples to
+files in that directory and the exposing process aggregates them. The
+directory must be empty when the service starts. Without the
+``prometheus_client`` package, or with ``METRICS_ENABLED=false``, every
+metric is a no-op.
+"""
+from __future__ import annotations
+
+import os
+import time
+from collections.abc import Callable
+from datetime import datetime
+
+from app.core.config import settings
+
+_multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if _multiproc_dir and settings.metrics_enabled:
+    # prometheus_client opens its files there as soon as a value exists.
+    os.makedirs(_multiproc_dir, exist_ok=True)
+
+try:  # Optional: without it, metrics are no-ops.
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Histogram, multiprocess
+except ImportError:  # pragma: no cover - depends on the environment
+    prometheus_client = None
+
+ENABLED = settings.metrics_enabled and prometheus_client is not None
+MULTIPROCESS = ENABLED and bool(_multiproc_dir)
+
+# Celery message header set at publish time; see app.worker.celery_app.
+PUBLISHED_AT_HEADER = "dnbkb_published_at"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECORD_PARSE_BUCKETS = (25e-6, 50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 10e-3)
+QUEUE_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0)
+THROUGHPUT_BUCKETS = (1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs) -> _NoopMetric:
+        return self
+
+    def observe(self, amount: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+
+_NOOP = _NoopMetric()
+
+
+def _histogram(name: str, documentation: str, labels: tuple[str, ...], buckets: tuple[float, ...] = LATENCY_BUCKETS):
+    if not ENABLED:
+        return _NOOP
+    return Histogram(name, documentation, labels, buckets=buckets)
+
+
+def _counter(name: str, documentation: str, labels: tuple[str, ...]):
+    if not ENABLED:
+        return _NOOP
+    return Counter(name, documentation, labels)
+
+
+HTTP_REQUEST_SECONDS = _histogram(
+    "dnbkb_http_request_seconds", "API request handling time, by route template", ("method", "route", "status")
+)
+SRU_REQUEST_SECONDS = _histogram(
+    "dnbkb_sru_request_seconds", "SRU searchRetrieve round trip until the last body byte", ("outcome",)
+)
+MARC_PARSE_RECORD_SECONDS = _histogram(
+    "dnbkb_marc_parse_record_seconds", "Time to parse one MARC record", ("outcome",), RECORD_PARSE_BUCKETS
+)
+DB_UPSERT_SECONDS = _histogram(
+    "dnbkb_db_upsert_seconds", "Bulk upsert of one page of parsed records (without commit)", ("operation",)
+)
+DB_UPSERT_ROWS = _counter("dnbkb_db_upserted_rows_total", "Rows written by bulk upserts", ("operation",))
+DOWNLOAD_SECONDS = _histogram(
+    "dnbkb_download_seconds", "Asset download into object storage, all attempts", ("mode", "outcome")
+)
+DOWNLOAD_TTFB_SECONDS = _histogram(
+    "dnbkb_download_ttfb_seconds", "Request start to origin response headers, per attempt", ("mode",)
+)
+DOWNLOAD_BYTES = _counter("dnbkb_download_bytes_total", "Body bytes of successful asset downloads", ("mode",))
+DOWNLOAD_THROUGHPUT = _histogram(
+    "dnbkb_download_throughput_bytes_per_second",
+    "Body bytes over transfer time (headers to upload done) of successful downloads",
+    ("mode",),
+    THROUGHPUT_BUCKETS,
+)
+RETRIES = _counter("dnbkb_retries_total", "Retries scheduled by tenacity", ("operation",))
+TASK_QUEUE_WAIT_SECONDS = _histogram(
+    "dnbkb_task_queue_wait_seconds", "Publish (or ETA/countdown) to start of execution", ("task",), QUEUE_WAIT_BUCKETS
+)
+TASK_SECONDS = _histogram("dnbkb_task_seconds", "Celery task run time", ("task", "state"))
+DNS_CACHE_LOOKUPS = _counter(
+    "dnbkb_dns_cache_lookups_total", "SSRF resolver lookups by cache outcome (hit, negative_hit, miss)", ("outcome",)
+)
+
+
+def count_retry(operation: str) -> Callable[[object], None]:
+    """``before_sleep`` callback for tenacity that counts a retry of ``operation``."""
+    counter = RETRIES.labels(operation)
+    return lambda _retry_state: counter.inc()
+
+
+def registry():
+    """Registry to expose: the aggregate of all processes in multiprocess mode."""
+    if not MULTIPROCESS:
+        return prometheus_client.REGISTRY
+    reg = CollectorRegistry()
+    multiprocess.MultiProcessCollector(reg)
+    return reg
+
+
+def render() -> tuple[bytes, str]:
+    """Text exposition format and its content type."""
+    return prometheus_client.generate_latest(registry()), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def start_exporter(port: int) -> None:
+    prometheus_client.start_http_server(port, registry=registry())
+
+
+def mark_process_dead(pid: int) -> None:
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
+
+
+# --- Celery hooks (connected in app.worker.celery_app) ---
+
+
+def task_started(task) -> None:
+    request = task.request
+    request.metrics_started = time.perf_counter()
+    published = request.get(PUBLISHED_AT_HEADER)
+    if published is None:
+        return
+    ready = float(published)
+    if request.eta:
+        eta = datetime.fromisoformat(request.eta) if isinstance(request.eta, str) else request.eta
+        ready = max(ready, eta.timestamp())
+    TASK_QUEUE_WAIT_SECONDS.labels(task.name).observe(max(0.0, time.time() - ready))
+
+
+def task_finished(task, state: str | None) -> None:
+    started = getattr(task.request, "metrics_started", None)
+    if started is not None:
+        TASK_SECONDS.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+# --- ASGI ---
+
+
+class MetricsMiddleware:
+    """Times API requests by route template (``/records/{idn}``), not raw path.
+
+    Plain ASGI rather than ``BaseHTTPMiddleware``, so streaming responses
+    (``/jobs/{id}/events``) pass through untouched.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - t0)
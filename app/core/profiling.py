@@ -0,0 +1,271 @@
+"""Opt-in sampling profiles (pyinstrument) of single API requests and Celery tasks.
+
+Requests: with ``PROFILING_ENABLED=true`` the API installs
+:class:`ProfilingMiddleware`. A request that carries ``X-Profile`` (or
+``?profile=``) and the admin token in ``X-Profile-Token`` is profiled:
+
+- ``store`` (or ``1``/``true``): the response is unchanged; the speedscope
+  profile is written to ``PROFILING_DIR`` and named in the ``X-Profile-Id``
+  response header (fetch it from ``GET /debug/profiles/{id}``).
+- ``speedscope`` / ``html``: the profile replaces the response body.
+
+pyinstrument samples one thread, so the middleware profiles the event loop
+and :func:`in_thread` (applied to sync routes by :class:`ProfilingRoute`)
+profiles threadpool work of the same request; the sessions are combined
+into one profile.
+
+Tasks: :func:`profiled_task` profiles a task run when its message carries
+the :data:`PROFILE_HEADER` header, which ingest jobs started by a profiled
+request get, or for a ``TASK_PROFILE_SAMPLE_RATE`` fraction of runs.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import hmac
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from contextvars import ContextVar
+from pathlib import Path
+from typing import TypeVar
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable)
+
+PROFILE_HEADER = "dnbkb_profile"
+
+_STORE_MODES = {"1", "true", "store"}
+_RETURN_MODES = {"speedscope", "html"}
+_profile_id_re = re.compile(r"^[\w.-]+\.speedscope\.json$")
+
+
+def _profiler(async_mode: str = "disabled"):
+    try:
+        from pyinstrument import Profiler
+    except ImportError as e:  # optional dependency
+        raise RuntimeError("Profiling needs the 'pyinstrument' package") from e
+    return Profiler(interval=settings.profiling_interval_seconds, async_mode=async_mode)
+
+
+class RequestProfile:
+    """Sessions recorded on behalf of one request, one per thread involved."""
+
+    def __init__(self) -> None:
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def add(self, session) -> None:
+        with self._lock:
+            self._sessions.append(session)
+
+    def combined(self):
+        from pyinstrument.session import Session
+
+        return functools.reduce(Session.combine, self._sessions)
+
+
+_current: ContextVar[RequestProfile | None] = ContextVar("dnbkb_request_profile", default=None)
+
+
+def profiling_active() -> bool:
+    return _current.get() is not None
+
+
+def in_thread(fn: F) -> F:
+    """Profile ``fn`` into the current request's profile, if there is one.
+
+    For sync callables that run on the threadpool (the context, and with it
+    the active profile, is copied into the worker thread).
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return fn(*args, **kwargs)
+        profiler = _profiler()
+        profiler.start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.add(profiler.stop())
+
+    return wrapper  # type: ignore[return-value]
+
+
+class ProfilingRoute(APIRoute):
+    """Route class that wraps sync endpoints in :func:`in_thread`."""
+
+    def get_route_handler(self):
+        if not asyncio.iscoroutinefunction(self.dependant.call):
+            self.dependant.call = in_thread(self.dependant.call)
+        return super().get_route_handler()
+
+
+def task_headers() -> dict:
+    """Message headers that make tasks dispatched now inherit an active request profile."""
+    return {PROFILE_HEADER: True} if profiling_active() else {}
+
+
+def _profiles_dir() -> Path:
+    path = Path(settings.profiling_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def new_profile_id(kind: str, name: str) -> str:
+    slug = re.sub(r"[^\w]+", "-", name).strip("-")[:60] or "root"
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{kind}-{slug}-{uuid.uuid4().hex[:8]}.speedscope.json"
+
+
+def profile_path(profile_id: str) -> Path | None:
+    if not _profile_id_re.match(profile_id):
+        return None
+    return _profiles_dir() / profile_id
+
+
+def store_profile(session, profile_id: str) -> Path:
+    from pyinstrument.renderers import SpeedscopeRenderer
+
+    directory = _profiles_dir()
+    path = directory / profile_id
+    path.write_text(SpeedscopeRenderer().render(session))
+    # Keep only the newest PROFILING_MAX_FILES profiles.
+    files = sorted(directory.glob("*.speedscope.json"), key=lambda p: p.stat().st_mtime)
+    for old in files[: max(0, len(files) - settings.profiling_max_files)]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+def check_token(token: str | None) -> bool:
+    expected = settings.profiling_token
+    return bool(expected and token) and hmac.compare_digest(token.encode(), expected.encode())
+
+
+# --- ASGI ---
+
+
+def _header(scope, name: bytes) -> str | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """Profiles requests that ask for it; see the module docstring."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = _header(scope, b"x-profile")
+        if mode is None:
+            mode = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile", [None])[-1]
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        mode = mode.lower()
+        if mode not in _STORE_MODES | _RETURN_MODES:
+            await _respond(send, 400, b'{"detail":"X-Profile must be store, speedscope or html"}', "application/json")
+            return
+        if not check_token(_header(scope, b"x-profile-token")):
+            await _respond(send, 403, b'{"detail":"Profiling requires a valid X-Profile-Token"}', "application/json")
+            return
+
+        profile = RequestProfile()
+        profile_id = new_profile_id("request", f"{scope['method']} {scope['path']}")
+        returning = mode in _RETURN_MODES
+
+        async def send_wrapper(message) -> None:
+            if returning:
+                return  # the profile is the response
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        token = _current.set(profile)
+        profiler = _profiler(async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.add(profiler.stop())
+            _current.reset(token)
+
+        session = profile.combined()
+        if mode == "html":
+            from pyinstrument.renderers import HTMLRenderer
+
+            await _respond(send, 200, HTMLRenderer().render(session).encode(), "text/html; charset=utf-8")
+        elif mode == "speedscope":
+            from pyinstrument.renderers import SpeedscopeRenderer
+
+            await _respond(send, 200, SpeedscopeRenderer().render(session).encode(), "application/json")
+        else:
+            path = store_profile(session, profile_id)
+            logger.info("Stored request profile %s (%.3fs)", path, session.duration)
+
+
+async def _respond(send, status: int, body: bytes, content_type: str) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+# --- Celery ---
+
+
+def profiled_task(fn: F) -> F:
+    """Profile runs of a Celery task function on request; put it under ``@shared_task``."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        from celery import current_task
+
+        request = current_task.request if current_task else None
+        # Custom headers are request attributes; eager runs keep them under .headers.
+        wanted = request is not None and bool(
+            request.get(PROFILE_HEADER) or (request.headers or {}).get(PROFILE_HEADER)
+        )
+        rate = settings.task_profile_sample_rate
+        if not wanted and not (rate > 0 and random.random() < rate):
+            return fn(*args, **kwargs)
+        try:
+            profiler = _profiler()
+        except RuntimeError as e:
+            logger.warning("%s; running %s unprofiled", e, fn.__name__)
+            return fn(*args, **kwargs)
+
+        profiler.start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            session = profiler.stop()
+            name = f"{current_task.name} {request.id}" if request is not None else fn.__name__
+            path = store_profile(session, new_profile_id("task", name))
+            logger.info("Stored task profile %s (%.3fs)", path, session.duration)
+
+    return wrapper  # type: ignore[return-value]
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import time
+import uuid
+from collections.abc import Iterable
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.metrics import DB_UPSERT_ROWS, DB_UPSERT_SECONDS
+from app.db.compression import compress_text
+from app.db.models import Asset, Job, JobItem, Link, Record, RecordSource
+from app.db.search import SearchDocument, search_document, search_vector, sync_sqlite_fts
+from app.dnb.marc import ParsedRecord
+
+
+# Postgres caps a statement at 65535 bind parameters; stay well below it.
+_CHUNK_ROWS = 1000
+
+
+def dialect_insert(db: Session):
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert
+    if name == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Bulk upsert is not supported for dialect {name!r}")
+
+
+def _chunks(rows: list[dict], size: int = _CHUNK_ROWS) -> Iterable[list[dict]]:
+    for i in range(0, len(rows), size):
+        yield rows[i : i + size]
+
+
+def upsert_parsed_records(db: Session, parsed: Iterable[ParsedRecord]) -> None:
+    """Upsert a page of parsed records and their 856 links in a few statements.
+
+    Uses ``INSERT ... ON CONFLICT DO UPDATE`` on ``records.idn`` and on
+    ``uq_record_url`` (Postgres, or SQLite for tests). Duplicate keys within
+    the page are collapsed first (last one wins), since a single upsert
+    statement may not touch the same row twice. Raw MARCXML is compressed
+    into ``record_sources``. The local search index (``search_vector`` on
+    Postgres, ``records_fts`` on SQLite) is refreshed in the same
+    transaction. Does not commit.
+    """
+    t0 = time.perf_counter()
+    dialect = db.get_bind().dialect.name
+    records: dict[str, dict] = {}
+    docs: dict[str, SearchDocument] = {}
+    sources: dict[str, dict] = {}
+    links: dict[tuple[str, str], dict] = {}
+    for p in parsed:
+        docs[p.idn] = doc = search_document(p)
+        records[p.idn] = {
+            "idn": p.idn,
+            "title": p.title,
+            "year": p.year,
+            "creators": p.creators,
+        }
+        raw = p.raw_marcxml
+        codec, data = compress_text(raw)
+        sources[p.idn] = {"idn": p.idn, "codec": codec, "data": data, "raw_size": len(raw)}
+        if dialect == "postgresql":
+            records[p.idn]["search_vector"] = search_vector(doc)
+        for l in p.links:
+            links[(p.idn, l.url)] = {
+                "id": str(uuid.uuid4()),
+                "record_idn": p.idn,
+                "url": l.url,
+                "label": l.label,
+                "description": l.description,
+                "kind": l.kind,
+            }
+
+    if not records:
+        return
+
+    insert = dialect_insert(db)
+
+    for chunk in _chunks(list(records.values())):
+        stmt = insert(Record).values(chunk)
+        set_ = {
+            "title": stmt.excluded.title,
+            "year": stmt.excluded.year,
+            "creators": stmt.excluded.creators,
+            "updated_at": func.now(),
+        }
+        if dialect == "postgresql":
+            set_["search_vector"] = stmt.excluded.search_vector
+        db.execute(stmt.on_conflict_do_update(index_elements=[Record.idn], set_=set_))
+
+    for chunk in _chunks(list(sources.values())):
+        stmt = insert(RecordSource).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RecordSource.idn],
+            set_={
+                "codec": stmt.excluded.codec,
+                "data": stmt.excluded.data,
+                "raw_size": stmt.excluded.raw_size,
+            },
+        )
+        db.execute(stmt)
+
+    if dialect == "sqlite":
+        sync_sqlite_fts(db, docs.values())
+
+    for chunk in _chunks(list(links.values())):
+        stmt = insert(Link).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Link.record_idn, Link.url],
+            set_={
+                "label": stmt.excluded.label,
+                "description": stmt.excluded.description,
+                "kind": stmt.excluded.kind,
+            },
+        )
+        db.execute(stmt)
+
+    DB_UPSERT_SECONDS.labels("records").observe(time.perf_counter() - t0)
+    DB_UPSERT_ROWS.labels("records").inc(len(records))
+    DB_UPSERT_ROWS.labels("links").inc(len(links))
+
+
+def insert_ingest_job(db: Session, link_ids: Iterable[str]) -> tuple[str, list[dict]]:
+    """Create a running job with one queued asset per link; returns ``(job_id, asset rows)``.
+
+    Ids are generated here, so the job, its assets and its items go in as
+    three executemany inserts, with no flush per row. Does not commit.
+    """
+    job_id = str(uuid.uuid4())
+    assets = _new_assets(link_ids)
+
+    db.execute(insert(Job), [{"id": job_id, "status": "running", "total": len(assets), "queued": len(assets)}])
+    _insert_job_assets(db, job_id, assets)
+    return job_id, assets
+
+
+def add_job_assets(db: Session, job_id: str, link_ids: Iterable[str]) -> list[dict]:
+    """Add one queued asset per link to an existing job and count them; returns the asset rows.
+
+    For jobs that grow while they run (``POST /ingest/query``). Does not commit.
+    """
+    assets = _new_assets(link_ids)
+    if assets:
+        _insert_job_assets(db, job_id, assets)
+        db.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(total=Job.total + len(assets), queued=Job.queued + len(assets))
+        )
+    return assets
+
+
+def _new_assets(link_ids: Iterable[str]) -> list[dict]:
+    return [{"id": str(uuid.uuid4()), "link_id": link_id, "status": "queued"} for link_id in dict.fromkeys(link_ids)]
+
+
+def _insert_job_assets(db: Session, job_id: str, assets: list[dict]) -> None:
+    for chunk in _chunks(assets):
+        db.execute(insert(Asset), chunk)
+        db.execute(
+            insert(JobItem),
+            [{"id": str(uuid.uuid4()), "job_id": job_id, "asset_id": a["id"]} for a in chunk],
+        )
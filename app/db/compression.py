@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import gzip
+
+from app.core.config import settings
+
+try:  # Optional: better ratio and much faster than gzip.
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+
+def available_codecs() -> list[str]:
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def _codec() -> str:
+    codec = settings.marcxml_codec
+    if codec == "zstd" and zstandard is None:
+        return "gzip"
+    return codec
+
+
+def compress_text(value: str, codec: str | None = None) -> tuple[str, bytes]:
+    """Compress ``value`` as UTF-8; returns ``(codec, data)``.
+
+    Uses ``marcxml_codec`` unless ``codec`` is given; ``zstd`` falls back to
+    gzip when the ``zstandard`` package is not installed.
+    """
+    codec = codec or _codec()
+    raw = value.encode("utf-8")
+    if codec == "zstd":
+        return codec, zstandard.ZstdCompressor(level=settings.marcxml_compression_level).compress(raw)
+    if codec == "gzip":
+        return codec, gzip.compress(raw, compresslevel=min(settings.marcxml_compression_level, 9), mtime=0)
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+def decompress_text(codec: str, data: bytes) -> str:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Stored MARCXML is zstd-compressed; install the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    if codec == "gzip":
+        return gzip.decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown codec {codec!r}")
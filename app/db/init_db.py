@@ -1,9 +1,40 @@
 from __future__ import annotations
 
-from app.db.base import Base
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
 from app.db.session import engine
 
+_ROOT = Path(__file__).resolve().parents[2]
+
+# Revision matching the tables the former create_all() bootstrap produced.
+_BOOTSTRAP_REVISION = "0001"
+
+
+def alembic_config() -> Config:
+    cfg = Config(str(_ROOT / "alembic.ini"))
+    cfg.set_main_option("script_location", str(_ROOT / "migrations"))
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
 
 def init_db() -> None:
-    # MVP: create tables automatically. For production, replace with Alembic migrations.
-    Base.metadata.create_all(bind=engine)
+    """Upgrade the database to the latest Alembic revision.
+
+    Databases created by the old ``create_all()`` startup have tables but no
+    ``alembic_version``; they are stamped at the initial revision first so
+    only the later migrations run.
+    """
+    with engine.connect() as connection:
+        tables = set(inspect(connection).get_table_names())
+
+    cfg = alembic_config()
+    # A fresh connection: Alembic must own its transactions (see 0003's autocommit block).
+    with engine.connect() as connection:
+        cfg.attributes["connection"] = connection
+        if "records" in tables and "alembic_version" not in tables:
+            command.stamp(cfg, _BOOTSTRAP_REVISION)
+        command.upgrade(cfg, "head")
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import base64
+import json
+from dataclasses import dataclass
+
+from sqlalchemy import Select, exists, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.db.models import Asset, Link, Record
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class RecordFilters:
+    year_min: int | None = None
+    year_max: int | None = None
+    link_kind: str | None = None
+    asset_status: str | None = None
+
+
+# A cursor is the (year, idn) of the last row served; year None sorts last.
+Cursor = tuple[int | None, str]
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(cursor)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    try:
+        year, idn = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if not (year is None or isinstance(year, int)) or not isinstance(idn, str):
+        raise InvalidCursor("Malformed cursor")
+    return year, idn
+
+
+def _filtered(filters: RecordFilters) -> Select:
+    q = select(Record)
+    if filters.year_min is not None:
+        q = q.where(Record.year >= filters.year_min)
+    if filters.year_max is not None:
+        q = q.where(Record.year <= filters.year_max)
+    if filters.link_kind is not None:
+        q = q.where(exists().where(Link.record_idn == Record.idn, Link.kind == filters.link_kind))
+    if filters.asset_status is not None:
+        q = q.where(
+            exists()
+            .where(Link.record_idn == Record.idn)
+            .where(Asset.link_id == Link.id, Asset.status == filters.asset_status)
+        )
+    return q
+
+
+def list_records(
+    db: Session,
+    filters: RecordFilters,
+    *,
+    after: Cursor | None = None,
+    limit: int = 50,
+) -> tuple[list[Record], Cursor | None]:
+    """One page of records ordered by ``(year NULLS LAST, idn)``, plus the next cursor.
+
+    Keyset pagination: each page starts from the last ``(year, idn)`` served
+    and walks ``ix_records_year_idn``, so page 10 000 costs the same as page
+    one. Rows with a year and rows without are read by two separate range
+    scans instead of one ``OR``, which keeps both on the index.
+    """
+    base = _filtered(filters)
+    rows: list[Record] = []
+
+    if after is None or after[0] is not None:
+        q = base.where(Record.year.is_not(None))
+        if after is not None:
+            q = q.where(tuple_(Record.year, Record.idn) > tuple_(*after))
+        rows += db.scalars(q.order_by(Record.year, Record.idn).limit(limit + 1))
+
+    nulls_possible = filters.year_min is None and filters.year_max is None
+    if len(rows) <= limit and nulls_possible:
+        q = base.where(Record.year.is_(None))
+        if after is not None and after[0] is None:
+            q = q.where(Record.idn > after[1])
+        rows += db.scalars(q.order_by(Record.idn).limit(limit + 1 - len(rows)))
+
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, (page[-1].year, page[-1].idn)
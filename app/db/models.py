@@ -4,17 +4,27 @@ import uuid
 from datetime import datetime
 
 from sqlalchemy import (
+    DDL,
+    JSON,
+    BigInteger,
+    Boolean,
     DateTime,
     ForeignKey,
+    Float,
+    Index,
     Integer,
+    LargeBinary,
     String,
     Text,
     UniqueConstraint,
+    event,
     func,
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
+from .compression import compress_text, decompress_text
 
 
 def _uuid_str() -> str:
@@ -27,12 +37,66 @@ class Record(Base):
     idn: Mapped[str] = mapped_column(String(64), primary_key=True)  # MARC 001, typically numeric
     title: Mapped[str | None] = mapped_column(String(1024), nullable=True)
     year: Mapped[int | None] = mapped_column(Integer, nullable=True)
-    raw_marcxml: Mapped[str] = mapped_column(Text, nullable=False)
+    creators: Mapped[list[str] | None] = mapped_column(JSON, nullable=True)
+    # Weighted title/creators/link text, written by the upsert (app.db.search).
+    # Postgres only; SQLite indexes the same text in the records_fts FTS5 table.
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR().with_variant(Text(), "sqlite"), nullable=True, deferred=True
+    )
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     links: Mapped[list[Link]] = relationship(back_populates="record", cascade="all, delete-orphan")
+    # Raw MARCXML lives compressed in its own table and is only fetched when read.
+    source: Mapped[RecordSource | None] = relationship(
+        back_populates="record", cascade="all, delete-orphan", lazy="select"
+    )
+
+    @property
+    def raw_marcxml(self) -> str | None:
+        return self.source.text if self.source is not None else None
+
+    @raw_marcxml.setter
+    def raw_marcxml(self, value: str) -> None:
+        codec, data = compress_text(value)
+        if self.source is None:
+            self.source = RecordSource(codec=codec, data=data, raw_size=len(value))
+        else:
+            self.source.codec, self.source.data, self.source.raw_size = codec, data, len(value)
+
+    __table_args__ = (
+        # Keyset pagination for GET /records: ORDER BY year, idn (NULL years last).
+        Index("ix_records_year_idn", "year", "idn"),
+        Index("ix_records_search_vector", "search_vector", postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
+
+class RecordSource(Base):
+    """Compressed MARCXML of a record (see ``app.db.compression``)."""
+
+    __tablename__ = "record_sources"
+
+    idn: Mapped[str] = mapped_column(ForeignKey("records.idn", ondelete="CASCADE"), primary_key=True)
+    codec: Mapped[str] = mapped_column(String(16), nullable=False)  # "zstd" or "gzip"
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    raw_size: Mapped[int] = mapped_column(Integer, nullable=False)  # characters before compression
+
+    record: Mapped[Record] = relationship(back_populates="source")
+
+    @property
+    def text(self) -> str:
+        return decompress_text(self.codec, self.data)
+
+
+RECORDS_FTS_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS records_fts "
+    "USING fts5(idn UNINDEXED, title, creators, links, tokenize='unicode61 remove_diacritics 2')"
+)
+RECORDS_FTS_DROP = "DROP TABLE IF EXISTS records_fts"
+
+event.listen(Record.__table__, "after_create", DDL(RECORDS_FTS_CREATE).execute_if(dialect="sqlite"))
+event.listen(Record.__table__, "after_drop", DDL(RECORDS_FTS_DROP).execute_if(dialect="sqlite"))
 
 
 class Link(Base):
@@ -53,6 +117,7 @@ class Link(Base):
 
     __table_args__ = (
         UniqueConstraint("record_idn", "url", name="uq_record_url"),
+        Index("ix_links_record_kind", "record_idn", "kind"),
     )
 
 
@@ -68,12 +133,38 @@ class Asset(Base):
     mime_type: Mapped[str | None] = mapped_column(String(255), nullable=True)
     size_bytes: Mapped[int | None] = mapped_column(Integer, nullable=True)
     error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Set when stored content-addressed; storage_key then is the blob's key.
+    blob_sha256: Mapped[str | None] = mapped_column(ForeignKey("blobs.sha256"), nullable=True)
+    # Times re-queued in a row because its host was busy or rate-limited.
+    deferrals: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     link: Mapped[Link] = relationship(back_populates="assets")
 
+    __table_args__ = (
+        Index("ix_assets_link_status", "link_id", "status"),
+        Index("ix_assets_status", "status"),
+    )
+
+
+class Blob(Base):
+    """A content-addressed object in the bucket, shared by all assets with that hash."""
+
+    __tablename__ = "blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    storage_key: Mapped[str] = mapped_column(String(1024), nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    mime_type: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Claimed by the garbage collector: the object is being removed, no new references.
+    deleting: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 
 class Job(Base):
     __tablename__ = "jobs"
@@ -81,10 +172,21 @@ class Job(Base):
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid_str)
     status: Mapped[str] = mapped_column(String(32), nullable=False, default="running")
 
+    # Progress counters, kept in step with asset status changes (app.db.progress).
+    total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    queued: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    downloading: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    done: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    failed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    # Set for POST /ingest/query jobs, which harvest their records first.
+    harvest_id: Mapped[str | None] = mapped_column(ForeignKey("harvests.id", ondelete="SET NULL"), nullable=True)
+
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     items: Mapped[list[JobItem]] = relationship(back_populates="job", cascade="all, delete-orphan")
+    harvest: Mapped[Harvest | None] = relationship()
 
 
 class JobItem(Base):
@@ -92,10 +194,52 @@ class JobItem(Base):
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid_str)
     job_id: Mapped[str] = mapped_column(ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False)
-    asset_id: Mapped[str] = mapped_column(ForeignKey("assets.id", ondelete="CASCADE"), nullable=False)
+    asset_id: Mapped[str] = mapped_column(ForeignKey("assets.id", ondelete="CASCADE"), nullable=False, index=True)
 
     job: Mapped[Job] = relationship(back_populates="items")
 
     __table_args__ = (
         UniqueConstraint("job_id", "asset_id", name="uq_job_asset"),
     )
+
+
+class Harvest(Base):
+    __tablename__ = "harvests"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid_str)
+    cql: Mapped[str] = mapped_column(Text, nullable=False)
+    max_records: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    status: Mapped[str] = mapped_column(String(32), nullable=False, default="queued")
+
+    number_of_records: Mapped[int | None] = mapped_column(Integer, nullable=True)  # SRU numberOfRecords
+    records_harvested: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    records_failed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # MARC parse errors
+    records_per_sec: Mapped[float | None] = mapped_column(Float, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class HostThrottle(Base):
+    """Per-host download budget shared by all worker processes (see app.worker.scheduler)."""
+
+    __tablename__ = "host_throttles"
+
+    host: Mapped[str] = mapped_column(String(255), primary_key=True)
+    rate: Mapped[float] = mapped_column(Float, nullable=False)  # tokens per second, adapted on 429
+    tokens: Mapped[float] = mapped_column(Float, nullable=False)
+    refilled_at: Mapped[float] = mapped_column(Float, nullable=False)  # unix time
+    blocked_until: Mapped[float | None] = mapped_column(Float, nullable=True)  # unix time, from Retry-After
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class HostLease(Base):
+    """One in-flight download against a host; expires if its worker dies."""
+
+    __tablename__ = "host_leases"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid_str)
+    host: Mapped[str] = mapped_column(ForeignKey("host_throttles.host", ondelete="CASCADE"), nullable=False, index=True)
+    expires_at: Mapped[float] = mapped_column(Float, nullable=False)  # unix time
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.db.models import Asset, Job, JobItem
+
+
+# Asset statuses that have a counter column on ``jobs``.
+COUNTED_STATUSES = ("queued", "downloading", "done", "failed")
+
+
+@dataclass
+class StatusChange:
+    asset_id: str
+    old: str | None  # None: the asset is new to its jobs
+    new: str | None  # None: the asset was deleted
+    size_bytes: int | None = None  # counted towards total_bytes while the asset is "done"
+
+
+def lock_assets(db: Session, asset_ids: Iterable[str]) -> set[str]:
+    """Lock the assets' rows (``SELECT ... FOR UPDATE``) and reload them into the session.
+
+    Returns the ids that still exist. Read ``old`` for a :class:`StatusChange`
+    only after this, in the same transaction: a status loaded earlier may
+    already have been changed (and counted) by another worker.
+    """
+    rows = db.execute(
+        select(Asset)
+        .where(Asset.id.in_(set(asset_ids)))
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    return {a.id for a in rows.scalars()}
+
+
+def apply_status_changes(db: Session, changes: Iterable[StatusChange]) -> None:
+    """Move the progress counters of every job that contains the changed assets.
+
+    Counters are adjusted with ``col = col + delta`` in the caller's
+    transaction, so they commit together with the asset rows and concurrent
+    workers never overwrite each other's increments. Each ``old`` must have
+    been read under the row lock (see :func:`lock_assets`), so a transition
+    is counted once. Does not commit.
+    """
+    changes = [c for c in changes if c.old != c.new]
+    if not changes:
+        return
+
+    jobs_by_asset: dict[str, list[str]] = defaultdict(list)
+    rows = db.execute(
+        select(JobItem.asset_id, JobItem.job_id).where(JobItem.asset_id.in_({c.asset_id for c in changes}))
+    )
+    for asset_id, job_id in rows:
+        jobs_by_asset[asset_id].append(job_id)
+
+    deltas: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for c in changes:
+        for job_id in jobs_by_asset.get(c.asset_id, ()):
+            d = deltas[job_id]
+            if c.old is None:
+                d["total"] += 1
+            elif c.old in COUNTED_STATUSES:
+                d[c.old] -= 1
+            if c.new is None:
+                d["total"] -= 1
+            elif c.new in COUNTED_STATUSES:
+                d[c.new] += 1
+            if c.old == "done":
+                d["total_bytes"] -= c.size_bytes or 0
+            if c.new == "done":
+                d["total_bytes"] += c.size_bytes or 0
+
+    for job_id, d in deltas.items():
+        values = {col: getattr(Job, col) + delta for col, delta in d.items() if delta}
+        if values:
+            db.execute(update(Job).where(Job.id == job_id).values(**values))
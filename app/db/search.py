@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from sqlalchemy import bindparam, func, literal_column, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Record
+from app.dnb.marc import ParsedRecord
+
+
+# Column weights: title, creators, link labels/descriptions.
+_BM25_WEIGHTS = "10.0, 5.0, 1.0"
+
+_word_re = re.compile(r"\w+", re.UNICODE)
+_config_re = re.compile(r"^[a-z_]+$")
+
+
+@dataclass
+class SearchDocument:
+    idn: str
+    title: str
+    creators: str
+    links: str
+
+
+def search_document(p: ParsedRecord) -> SearchDocument:
+    return SearchDocument(
+        idn=p.idn,
+        title=p.title or "",
+        creators=" ".join(p.creators),
+        links=" ".join(filter(None, (t for l in p.links for t in (l.label, l.description)))),
+    )
+
+
+def _ts_config():
+    cfg = settings.search_text_config
+    if not _config_re.match(cfg):
+        raise ValueError(f"Invalid text search configuration {cfg!r}")
+    return literal_column(f"'{cfg}'::regconfig")
+
+
+def search_vector(doc: SearchDocument):
+    """Weighted ``tsvector`` expression for ``records.search_vector`` (Postgres)."""
+    cfg = _ts_config()
+    parts = [(doc.title, "A"), (doc.creators, "B"), (doc.links, "C")]
+    vector = None
+    for value, weight in parts:
+        part = func.setweight(func.to_tsvector(cfg, value), literal_column(f"'{weight}'"))
+        vector = part if vector is None else vector.op("||")(part)
+    return vector
+
+
+def sync_sqlite_fts(db: Session, docs: Iterable[SearchDocument]) -> None:
+    """Replace the FTS5 rows of ``docs`` (SQLite only; Postgres keeps the vector on the row)."""
+    rows = [vars(d) for d in docs]
+    if not rows:
+        return
+    db.execute(
+        text("DELETE FROM records_fts WHERE idn IN :idns").bindparams(bindparam("idns", expanding=True)),
+        {"idns": [r["idn"] for r in rows]},
+    )
+    db.execute(
+        text("INSERT INTO records_fts (idn, title, creators, links) VALUES (:idn, :title, :creators, :links)"),
+        rows,
+    )
+
+
+def _fts5_query(q: str) -> str | None:
+    # Quote every word: user input never reaches the FTS5 query syntax.
+    words = _word_re.findall(q)
+    if not words:
+        return None
+    return " ".join(f'"{w}"' for w in words)
+
+
+@dataclass
+class SearchHit:
+    record: Record
+    rank: float
+
+
+def search_records(db: Session, q: str, *, limit: int = 20, offset: int = 0) -> tuple[list[SearchHit], bool]:
+    """Ranked full-text search over stored records; returns ``(hits, has_more)``.
+
+    Postgres matches ``websearch_to_tsquery`` against the GIN-indexed
+    ``search_vector`` and orders by ``ts_rank_cd``; SQLite uses FTS5 with
+    ``bm25``. Higher ``rank`` is better on both.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        query = func.websearch_to_tsquery(_ts_config(), q)
+        rank = func.ts_rank_cd(Record.search_vector, query)
+        stmt = (
+            select(Record, rank.label("rank"))
+            .where(Record.search_vector.op("@@")(query))
+            .order_by(rank.desc(), Record.idn)
+        )
+    elif dialect == "sqlite":
+        match = _fts5_query(q)
+        if match is None:
+            return [], False
+        fts = (
+            select(
+                literal_column("idn").label("idn"),
+                literal_column(f"-bm25(records_fts, 0.0, {_BM25_WEIGHTS})").label("rank"),
+            )
+            .select_from(text("records_fts"))
+            .where(text("records_fts MATCH :match").bindparams(match=match))
+            .subquery()
+        )
+        stmt = (
+            select(Record, fts.c.rank)
+            .join(fts, fts.c.idn == Record.idn)
+            .order_by(fts.c.rank.desc(), Record.idn)
+        )
+    else:
+        raise NotImplementedError(f"Local search is not supported for dialect {dialect!r}")
+
+    rows = db.execute(stmt.limit(limit + 1).offset(offset)).all()
+    hits = [SearchHit(record=r, rank=float(score)) for r, score in rows[:limit]]
+    return hits, len(rows) > limit
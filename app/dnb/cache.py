@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from typing import Protocol
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(cql: str, start_record: int, maximum_records: int, record_schema: str) -> str:
+    # CQL is whitespace-insensitive between terms; keep case, DNB indexes differ there.
+    normalized_cql = " ".join(cql.split())
+    return f"sru:v1:{record_schema}:{start_record}:{maximum_records}:{normalized_cql}"
+
+
+class SharedCache(Protocol):
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+
+class RedisSharedCache:
+    """Shared tier on Redis, so several API processes share SRU responses."""
+
+    def __init__(self, url: str) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:  # optional dependency
+            raise RuntimeError("SRU_CACHE_REDIS_URL is set but the 'redis' package is not installed") from e
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        await self._redis.set(key, value, px=int(ttl_seconds * 1000))
+
+    async def aclose(self) -> None:
+        await self._redis.aclose()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    shared_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+
+    def as_dict(self) -> dict:
+        d = asdict(self)
+        lookups = self.hits + self.shared_hits + self.misses + self.coalesced
+        # Every lookup that did not go upstream saved one SRU request.
+        d["upstream_saved_ratio"] = (lookups - self.misses) / lookups if lookups else 0.0
+        return d
+
+
+class SruResponseCache:
+    """Two-tier cache for raw SRU response bodies with single-flight loading.
+
+    The in-process tier is an LRU bounded by entry count and total bytes, with
+    a TTL per entry. An optional shared tier (e.g. Redis) is consulted on a
+    local miss. Concurrent lookups of the same key wait for one upstream fetch.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        max_bytes: int,
+        ttl_seconds: float,
+        shared: SharedCache | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.stats = CacheStats()
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._size = 0
+        self._inflight: dict[str, asyncio.Task[bytes]] = {}
+
+    @classmethod
+    def from_settings(cls) -> SruResponseCache | None:
+        if not settings.sru_cache_enabled:
+            return None
+        shared = RedisSharedCache(settings.sru_cache_redis_url) if settings.sru_cache_redis_url else None
+        return cls(
+            max_entries=settings.sru_cache_max_entries,
+            max_bytes=settings.sru_cache_max_bytes,
+            ttl_seconds=settings.sru_cache_ttl_seconds,
+            shared=shared,
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_local(self, key: str) -> bytes | None:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= self._clock():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put_local(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._size += len(value)
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._size -= len(value)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[bytes]]) -> bytes:
+        value = self.get_local(key)
+        if value is not None:
+            self.stats.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._load(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+
+        # Shield: a cancelled caller must not cancel the fetch other callers wait on.
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, fetch: Callable[[], Awaitable[bytes]]) -> bytes:
+        if self.shared is not None:
+            try:
+                value = await self.shared.get(key)
+            except Exception:
+                logger.warning("Shared SRU cache lookup failed", exc_info=True)
+                value = None
+            if value is not None:
+                self.stats.shared_hits += 1
+                self.put_local(key, value)
+                return value
+
+        self.stats.misses += 1
+        value = await fetch()
+        self.put_local(key, value)
+
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, value, self.ttl_seconds)
+            except Exception:
+                logger.warning("Shared SRU cache store failed", exc_info=True)
+        return value
+
+    async def aclose(self) -> None:
+        if self.shared is not None:
+            await self.shared.aclose()
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
 import re
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 
 from lxml import etree
 
+from app.core.metrics import MARC_PARSE_RECORD_SECONDS
+
 
 MARC_NS = {"m": "http://www.loc.gov/MARC21/slim"}
 
+_CONTROLFIELD = "{%s}controlfield" % MARC_NS["m"]
+_DATAFIELD = "{%s}datafield" % MARC_NS["m"]
+_SUBFIELD = "{%s}subfield" % MARC_NS["m"]
+
 
 @dataclass
 class ParsedLink:
@@ -24,7 +31,21 @@ class ParsedRecord:
     year: int | None
     creators: list[str]
     links: list[ParsedLink]
-    raw_marcxml: str
+    element: etree._Element | None = field(default=None, repr=False, compare=False)
+    _raw_marcxml: str | None = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def raw_marcxml(self) -> str:
+        """The record as MARCXML, serialized from ``element`` on first access."""
+        if self._raw_marcxml is None:
+            if self.element is None:
+                raise ValueError(f"Record {self.idn} has neither raw MARCXML nor an element")
+            self._raw_marcxml = etree.tostring(self.element, encoding="unicode")
+        return self._raw_marcxml
+
+    @raw_marcxml.setter
+    def raw_marcxml(self, value: str) -> None:
+        self._raw_marcxml = value
 
 
 _year_re = re.compile(r"(1[5-9]\d{2}|20\d{2})")
@@ -37,22 +58,99 @@ def _text(el: etree._Element | None) -> str | None:
     return t or None
 
 
-def parse_marcxml_record(marcxml: str) -> ParsedRecord:
-    root = etree.fromstring(marcxml.encode("utf-8"))
+def _link_kind(url: str, label: str | None, description: str | None) -> str:
+    marker = (description or "") + " " + (label or "")
+    if "inhaltsverzeichnis" in marker.lower():
+        return "toc"
+    if "d-nb.info" in url:
+        return "dnb"
+    return "external"
+
+
+def parse_marc_element(record: etree._Element) -> ParsedRecord:
+    """Parse an already-built MARCXML ``<record>`` element in one pass.
+
+    Walks the control and data fields once and dispatches on tag/code,
+    instead of running one XPath scan per field of interest. The raw
+    MARCXML is not serialized here; see :attr:`ParsedRecord.raw_marcxml`.
+    """
+    idn: str | None = None
+    title_a: str | None = None
+    title_b: str | None = None
+    c_264: str | None = None
+    c_260: str | None = None
+    creators_100: list[str] = []
+    creators_700: list[str] = []
+    links: list[ParsedLink] = []
+
+    for fld in record:
+        ftag = fld.tag
+        if ftag == _CONTROLFIELD:
+            if idn is None and fld.get("tag") == "001":
+                idn = fld.text or ""
+            continue
+        if ftag != _DATAFIELD:
+            continue
+
+        tag = fld.get("tag")
+        if tag == "245":
+            for sf in fld:
+                if sf.tag != _SUBFIELD:
+                    continue
+                code = sf.get("code")
+                if code == "a" and title_a is None:
+                    title_a = sf.text or ""
+                elif code == "b" and title_b is None:
+                    title_b = sf.text or ""
+        elif tag == "264" or tag == "260":
+            if (c_264 if tag == "264" else c_260) is not None:
+                continue
+            for sf in fld:
+                if sf.tag == _SUBFIELD and sf.get("code") == "c":
+                    if tag == "264":
+                        c_264 = sf.text or ""
+                    else:
+                        c_260 = sf.text or ""
+                    break
+        elif tag == "100" or tag == "700":
+            target = creators_100 if tag == "100" else creators_700
+            for sf in fld:
+                if sf.tag == _SUBFIELD and sf.get("code") == "a":
+                    t = _text(sf)
+                    if t:
+                        target.append(t)
+        elif tag == "856":
+            urls: list[str] = []
+            description: str | None = None
+            label: str | None = None
+            seen_3 = seen_y = False
+            for sf in fld:
+                if sf.tag != _SUBFIELD:
+                    continue
+                code = sf.get("code")
+                if code == "u":
+                    url = _text(sf)
+                    if url:
+                        urls.append(url)
+                elif code == "3" and not seen_3:
+                    seen_3 = True
+                    description = _text(sf)
+                elif code == "y" and not seen_y:
+                    seen_y = True
+                    label = _text(sf)
+            for url in urls:
+                links.append(
+                    ParsedLink(url=url, label=label, description=description, kind=_link_kind(url, label, description))
+                )
 
-    idn = root.findtext(".//m:controlfield[@tag='001']", namespaces=MARC_NS)
     if not idn:
         # fall back to 003/001 combos? For MVP, require 001.
         raise ValueError("MARCXML record missing controlfield 001")
 
     # Title: 245 $a + $b
-    title_a = root.findtext(".//m:datafield[@tag='245']/m:subfield[@code='a']", namespaces=MARC_NS)
-    title_b = root.findtext(".//m:datafield[@tag='245']/m:subfield[@code='b']", namespaces=MARC_NS)
     title = " ".join([t.strip(" /:") for t in [title_a or "", title_b or ""] if t.strip()]).strip() or None
 
     # Year: prefer 264$c then 260$c; extract 4-digit year
-    c_264 = root.findtext(".//m:datafield[@tag='264']/m:subfield[@code='c']", namespaces=MARC_NS)
-    c_260 = root.findtext(".//m:datafield[@tag='260']/m:subfield[@code='c']", namespaces=MARC_NS)
     year = None
     for candidate in [c_264, c_260]:
         if not candidate:
@@ -64,36 +162,9 @@ def parse_marcxml_record(marcxml: str) -> ParsedRecord:
 
     # Creators: 100$a and 700$a
     creators: list[str] = []
-    for path in [
-        ".//m:datafield[@tag='100']/m:subfield[@code='a']",
-        ".//m:datafield[@tag='700']/m:subfield[@code='a']",
-    ]:
-        for el in root.findall(path, namespaces=MARC_NS):
-            t = _text(el)
-            if t and t not in creators:
-                creators.append(t)
-
-    links: list[ParsedLink] = []
-    for field in root.findall(".//m:datafield[@tag='856']", namespaces=MARC_NS):
-        url_els = field.findall("./m:subfield[@code='u']", namespaces=MARC_NS)
-        desc_3 = field.find("./m:subfield[@code='3']", namespaces=MARC_NS)
-        label_y = field.find("./m:subfield[@code='y']", namespaces=MARC_NS)
-        description = _text(desc_3)
-        label = _text(label_y)
-
-        for uel in url_els:
-            url = (_text(uel) or "").strip()
-            if not url:
-                continue
-
-            kind = "external"
-            marker = (description or "") + " " + (label or "")
-            if "inhaltsverzeichnis" in marker.lower():
-                kind = "toc"
-            elif "d-nb.info" in url:
-                kind = "dnb"
-
-            links.append(ParsedLink(url=url, label=label, description=description, kind=kind))
+    for t in creators_100 + creators_700:
+        if t not in creators:
+            creators.append(t)
 
     return ParsedRecord(
         idn=idn,
@@ -101,5 +172,40 @@ def parse_marcxml_record(marcxml: str) -> ParsedRecord:
         year=year,
         creators=creators,
         links=links,
-        raw_marcxml=marcxml,
+        element=record,
     )
+
+
+def parse_marcxml_record(marcxml: str) -> ParsedRecord:
+    parsed = parse_marc_element(etree.fromstring(marcxml.encode("utf-8")))
+    parsed.raw_marcxml = marcxml
+    return parsed
+
+
+@dataclass
+class RecordParseError:
+    position: int  # index of the record in the batch that was parsed
+    error: str
+
+
+def describe_parse_error(e: Exception) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+_parse_ok = MARC_PARSE_RECORD_SECONDS.labels("ok")
+_parse_error = MARC_PARSE_RECORD_SECONDS.labels("error")
+
+
+def parse_marc_records(records: list[etree._Element]) -> tuple[list[ParsedRecord], list[RecordParseError]]:
+    parsed: list[ParsedRecord] = []
+    errors: list[RecordParseError] = []
+    for i, record in enumerate(records):
+        t0 = time.perf_counter()
+        try:
+            parsed.append(parse_marc_element(record))
+        except Exception as e:
+            errors.append(RecordParseError(position=i, error=describe_parse_error(e)))
+            _parse_error.observe(time.perf_counter() - t0)
+        else:
+            _parse_ok.observe(time.perf_counter() - t0)
+    return parsed, errors
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree
+
+from app.core.config import settings
+from app.core.metrics import MARC_PARSE_RECORD_SECONDS
+from app.dnb.marc import (
+    ParsedLink,
+    ParsedRecord,
+    RecordParseError,
+    describe_parse_error,
+    parse_marc_element,
+    parse_marc_records,
+)
+
+logger = logging.getLogger(__name__)
+
+# (idn, title, year, creators, ((url, label, description, kind), ...))
+CompactRecord = tuple[str, str | None, int | None, tuple[str, ...], tuple[tuple[str, str | None, str | None, str], ...]]
+
+
+def _parse_chunk(raws: list[str]) -> list[tuple[CompactRecord | None, str | None]]:
+    """Worker side: parse serialized records into plain tuples (cheap to pickle)."""
+    out: list[tuple[CompactRecord | None, str | None]] = []
+    for raw in raws:
+        t0 = time.perf_counter()
+        try:
+            p = parse_marc_element(etree.fromstring(raw))
+        except Exception as e:
+            out.append((None, describe_parse_error(e)))
+            MARC_PARSE_RECORD_SECONDS.labels("error").observe(time.perf_counter() - t0)
+            continue
+        MARC_PARSE_RECORD_SECONDS.labels("ok").observe(time.perf_counter() - t0)
+        links = tuple((l.url, l.label, l.description, l.kind) for l in p.links)
+        out.append(((p.idn, p.title, p.year, tuple(p.creators), links), None))
+    return out
+
+
+class MarcParsePool:
+    """Parse MARC records for bulk harvests on a pool of worker processes.
+
+    Records are serialized once (persistence needs the MARCXML anyway), sent
+    to the workers in chunks, and come back as compact tuples that are turned
+    into :class:`ParsedRecord` objects here. Falls back to inline parsing when
+    ``workers`` is 0 or when running inside a daemonic process (e.g. a Celery
+    prefork child), which may not start children of its own.
+    """
+
+    def __init__(self, workers: int | None = None, chunk_size: int | None = None) -> None:
+        self.workers = settings.marc_parse_workers if workers is None else workers
+        self.chunk_size = chunk_size or settings.marc_parse_chunk_size
+        if self.workers > 0 and multiprocessing.current_process().daemon:
+            logger.warning("Daemonic process cannot start MARC parse workers; parsing inline")
+            self.workers = 0
+        self._executor: ProcessPoolExecutor | None = None
+        if self.workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def __enter__(self) -> MarcParsePool:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def parse(self, records: list[etree._Element]) -> tuple[list[ParsedRecord], list[RecordParseError]]:
+        if self._executor is None:
+            return parse_marc_records(records)
+
+        raws = [etree.tostring(r, encoding="unicode") for r in records]
+        futures = [
+            self._executor.submit(_parse_chunk, raws[i : i + self.chunk_size])
+            for i in range(0, len(raws), self.chunk_size)
+        ]
+
+        parsed: list[ParsedRecord] = []
+        errors: list[RecordParseError] = []
+        position = 0
+        for future in futures:
+            for compact, error in future.result():
+                if compact is None:
+                    errors.append(RecordParseError(position=position, error=error or "unknown error"))
+                else:
+                    idn, title, year, creators, links = compact
+                    rec = ParsedRecord(
+                        idn=idn,
+                        title=title,
+                        year=year,
+                        creators=list(creators),
+                        links=[ParsedLink(*l) for l in links],
+                    )
+                    rec.raw_marcxml = raws[position]
+                    parsed.append(rec)
+                position += 1
+        return parsed, errors
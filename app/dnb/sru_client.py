@@ -1,25 +1,179 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack, aclosing
 from dataclasses import dataclass
 
 import httpx
 from lxml import etree
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
 
 from app.core.config import settings
+from app.core.metrics import SRU_REQUEST_SECONDS, count_retry
+from app.dnb.cache import SruResponseCache, make_cache_key
 
 
 SRU_NS = {"srw": "http://www.loc.gov/zing/srw/"}
 
+_SRW_NUMBER_OF_RECORDS = "{%s}numberOfRecords" % SRU_NS["srw"]
+_SRW_RECORD = "{%s}record" % SRU_NS["srw"]
+_SRW_RECORD_DATA = "{%s}recordData" % SRU_NS["srw"]
+
+# Slice size when replaying a cached body through the pull parser.
+_FEED_CHUNK_BYTES = 64 * 1024
+
 
 @dataclass
 class SruSearchResult:
     number_of_records: int
-    records: list[str]  # raw MARCXML <record> as string
+    records: list[etree._Element]  # MARCXML <record> elements
+    start_record: int = 1
+
+
+class SruPullParser:
+    """Incremental parser for SRU ``searchRetrieveResponse`` bodies.
+
+    Feed it response chunks; it returns each MARC ``<record>`` as soon as its
+    enclosing ``srw:record`` closes. The MARC element is detached and the
+    processed ``srw:record`` wrappers are cleared, so the parser only ever
+    holds the record currently being read, not the whole document.
+    """
+
+    def __init__(self) -> None:
+        self.number_of_records = 0
+        self._parser = etree.XMLPullParser(events=("end",), tag=(_SRW_NUMBER_OF_RECORDS, _SRW_RECORD))
+
+    def feed(self, chunk: bytes) -> list[etree._Element]:
+        self._parser.feed(chunk)
+        return self._drain()
+
+    def close(self) -> list[etree._Element]:
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self) -> list[etree._Element]:
+        records: list[etree._Element] = []
+        for _, el in self._parser.read_events():
+            if el.tag == _SRW_NUMBER_OF_RECORDS:
+                try:
+                    self.number_of_records = int((el.text or "0").strip())
+                except ValueError:
+                    self.number_of_records = 0
+                continue
+
+            # recordData contains the MARCXML record as a child element.
+            rd = el.find(_SRW_RECORD_DATA)
+            if rd is not None and len(rd) > 0:
+                marc = rd[0]
+                rd.remove(marc)
+                records.append(marc)
+
+            el.clear()
+            parent = el.getparent()
+            if parent is not None:
+                while el.getprevious() is not None:
+                    del parent[0]
+        return records
 
 
 class SruClient:
-    def __init__(self, base_url: str | None = None) -> None:
+    """SRU client backed by one long-lived, pooled ``httpx.AsyncClient``.
+
+    Open it once per application (see the lifespan in ``app.main``) and share
+    it, so queries reuse keep-alive connections to the SRU host. Calling
+    :meth:`search` on a client that was never opened falls back to a
+    one-shot connection. With a ``cache``, identical queries are answered
+    from it and concurrent ones share a single upstream request.
+    """
+
+    def __init__(self, base_url: str | None = None, *, cache: SruResponseCache | None = None) -> None:
         self.base_url = base_url or settings.sru_base_url
+        self.cache = cache
+        self._client: httpx.AsyncClient | None = None
+
+    def _new_http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=settings.http_timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=settings.sru_max_connections,
+                max_keepalive_connections=settings.sru_max_keepalive_connections,
+                keepalive_expiry=settings.sru_keepalive_expiry_seconds,
+            ),
+            http2=settings.sru_http2,
+        )
+
+    async def open(self) -> None:
+        if self._client is None:
+            self._client = self._new_http_client()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self.cache is not None:
+            await self.cache.aclose()
+
+    async def __aenter__(self) -> SruClient:
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def _stream(self, params: dict[str, str]) -> AsyncIterator[bytes]:
+        t0 = time.perf_counter()
+        outcome = "error"
+        try:
+            async with AsyncExitStack() as stack:
+                client = self._client
+                if client is None:
+                    client = await stack.enter_async_context(self._new_http_client())
+                r = await stack.enter_async_context(client.stream("GET", self.base_url, params=params))
+                r.raise_for_status()
+                async for chunk in r.aiter_bytes():
+                    yield chunk
+            outcome = "ok"
+        finally:
+            SRU_REQUEST_SECONDS.labels(outcome).observe(time.perf_counter() - t0)
+
+    async def _get(self, params: dict[str, str]) -> bytes:
+        async with aclosing(self._stream(params)) as chunks:
+            return b"".join([chunk async for chunk in chunks])
+
+    @staticmethod
+    def _params(cql: str, start_record: int, maximum_records: int, record_schema: str) -> dict[str, str]:
+        return {
+            "version": "1.1",
+            "operation": "searchRetrieve",
+            "query": cql,
+            "startRecord": str(start_record),
+            "maximumRecords": str(maximum_records),
+            "recordSchema": record_schema,
+        }
+
+    async def iter_records(
+        self,
+        cql: str,
+        *,
+        start_record: int = 1,
+        maximum_records: int = 10,
+        record_schema: str = "MARC21-xml",
+    ) -> AsyncIterator[tuple[int, etree._Element]]:
+        """Yield ``(number_of_records, record)`` as each record arrives off the wire.
+
+        The response is never buffered as a whole; see :class:`SruPullParser`.
+        """
+        parser = SruPullParser()
+        params = self._params(cql, start_record, maximum_records, record_schema)
+        async with aclosing(self._stream(params)) as chunks:
+            async for chunk in chunks:
+                for record in parser.feed(chunk):
+                    yield parser.number_of_records, record
+        for record in parser.close():
+            yield parser.number_of_records, record
 
     async def search(
         self,
@@ -28,35 +182,85 @@ class SruClient:
         start_record: int = 1,
         maximum_records: int = 10,
         record_schema: str = "MARC21-xml",
+        use_cache: bool = True,
     ) -> SruSearchResult:
-        params = {
-            "version": "1.1",
-            "operation": "searchRetrieve",
-            "query": cql,
-            "startRecord": str(start_record),
-            "maximumRecords": str(maximum_records),
-            "recordSchema": record_schema,
-        }
+        params = self._params(cql, start_record, maximum_records, record_schema)
+        parser = SruPullParser()
+        marc_records: list[etree._Element] = []
 
-        async with httpx.AsyncClient(timeout=settings.http_timeout_seconds) as client:
-            r = await client.get(self.base_url, params=params)
-            r.raise_for_status()
+        if self.cache is None or not use_cache:
+            async with aclosing(self._stream(params)) as chunks:
+                async for chunk in chunks:
+                    marc_records.extend(parser.feed(chunk))
+        else:
+            key = make_cache_key(cql, start_record, maximum_records, record_schema)
+            content = await self.cache.get_or_fetch(key, lambda: self._get(params))
+            view = memoryview(content)
+            for i in range(0, len(view), _FEED_CHUNK_BYTES):
+                marc_records.extend(parser.feed(view[i : i + _FEED_CHUNK_BYTES].tobytes()))
+        marc_records.extend(parser.close())
 
-        root = etree.fromstring(r.content)
-        n_str = root.findtext(".//srw:numberOfRecords", namespaces=SRU_NS) or "0"
-        try:
-            n = int(n_str)
-        except ValueError:
-            n = 0
+        return SruSearchResult(
+            number_of_records=parser.number_of_records,
+            records=marc_records,
+            start_record=start_record,
+        )
 
-        rec_nodes = root.findall(".//srw:records/srw:record", namespaces=SRU_NS)
-        marcxml_records: list[str] = []
-        for rec in rec_nodes:
-            # recordData contains the MARCXML record as a child element.
-            rd = rec.find(".//srw:recordData", namespaces=SRU_NS)
-            if rd is None or len(rd) == 0:
-                continue
-            marc = rd[0]
-            marcxml_records.append(etree.tostring(marc, encoding="unicode"))
+    async def _harvest_page(self, cql: str, start_record: int, maximum_records: int, record_schema: str) -> SruSearchResult:
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(4),
+            wait=wait_exponential(multiplier=1, min=1, max=30),
+            retry=retry_if_exception_type(httpx.TransportError),
+            before_sleep=count_retry("sru"),
+            reraise=True,
+        ):
+            with attempt:
+                # Harvest pages are read once; keep them out of the query cache.
+                return await self.search(
+                    cql,
+                    start_record=start_record,
+                    maximum_records=maximum_records,
+                    record_schema=record_schema,
+                    use_cache=False,
+                )
+        raise AssertionError("unreachable")
+
+    async def harvest(
+        self,
+        cql: str,
+        *,
+        start_record: int = 1,
+        max_records: int | None = None,
+        page_size: int = 100,
+        concurrency: int = 4,
+        record_schema: str = "MARC21-xml",
+    ) -> AsyncIterator[SruSearchResult]:
+        """Page through the whole result set of ``cql``, yielding pages in order.
+
+        The first page tells us ``numberOfRecords``; after that up to
+        ``concurrency`` further pages are fetched ahead. New fetches are only
+        started when the consumer pulls, so a slow consumer bounds memory to
+        ``concurrency`` pages.
+        """
+        first_size = page_size if max_records is None else min(page_size, max_records)
+        first = await self._harvest_page(cql, start_record, first_size, record_schema)
+        end = first.number_of_records
+        if max_records is not None:
+            end = min(end, start_record + max_records - 1)
+        yield first
 
-        return SruSearchResult(number_of_records=n, records=marcxml_records)
+        next_start = start_record + first_size
+        pending: deque[asyncio.Task[SruSearchResult]] = deque()
+        try:
+            while next_start <= end or pending:
+                while next_start <= end and len(pending) < concurrency:
+                    size = min(page_size, end - next_start + 1)
+                    pending.append(
+                        asyncio.create_task(self._harvest_page(cql, next_start, size, record_schema))
+                    )
+                    next_start += size
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import TypeVar
+from urllib.parse import urlparse
+
+import httpx
+from tenacity import AsyncRetrying, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+
+from app.core.config import settings
+from app.core.metrics import DOWNLOAD_SECONDS, DOWNLOAD_TTFB_SECONDS, count_retry
+from app.ingest.downloader import (
+    DownloadResult,
+    RateLimited,
+    _known_length,
+    _observe_transfer,
+    _parse_retry_after,
+    _SpooledBody,
+    _upload_spooled,
+    _upload_streaming,
+)
+from app.ingest.http import SafeAsyncHTTPTransport, download_limits
+from app.ingest.storage import ensure_bucket, get_minio_client
+from app.ingest.url_safety import assert_safe_fetch_url
+
+T = TypeVar("T")
+
+# Chunks buffered between the event loop and an upload thread, per transfer.
+_PIPE_DEPTH = 8
+_EOF = object()
+
+
+class _Failed:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+async def _pipe_to_thread(chunks: AsyncIterator[bytes], consume: Callable[[Iterator[bytes]], T]) -> T:
+    """Run ``consume`` in the default executor, feeding it ``chunks`` from the loop.
+
+    The queue between the two is bounded, so a slow upload pauses reading
+    from the origin instead of buffering the body. Hashing, the size limit
+    and the MinIO calls all happen inside ``consume``, off the loop.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_PIPE_DEPTH)
+
+    def iter_chunks() -> Iterator[bytes]:
+        while True:
+            item = asyncio.run_coroutine_threadsafe(queue.get(), loop).result()
+            if item is _EOF:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+
+    async def produce() -> None:
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(_Failed(e))
+            return
+        await queue.put(_EOF)
+
+    consumer = loop.run_in_executor(None, consume, iter_chunks())
+    producer = asyncio.ensure_future(produce())
+    try:
+        return await consumer
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        if not consumer.done():
+            # We were cancelled; unblock the upload thread so it can exit.
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(_Failed(asyncio.CancelledError()))
+
+
+class AsyncDownloadEngine:
+    """Runs asset downloads concurrently on an event loop in a background thread.
+
+    One ``httpx.AsyncClient`` (with the same IP pinning as the sync client)
+    serves up to ``concurrency`` transfers at once. Each body is piped into a
+    MinIO upload running on the loop's thread pool, so a worker process holds
+    tens of transfers in flight while waiting on slow origins. Callers from
+    synchronous code (Celery tasks) use :meth:`run`.
+    """
+
+    def __init__(self, concurrency: int) -> None:
+        self.concurrency = concurrency
+        self._loop = asyncio.new_event_loop()
+        # One thread per active upload, plus a few for scheduler/DB calls.
+        self._executor = ThreadPoolExecutor(max_workers=concurrency + 4, thread_name_prefix="download-io")
+        self._loop.set_default_executor(self._executor)
+        self._thread = threading.Thread(target=self._loop.run_forever, name="download-loop", daemon=True)
+        self._thread.start()
+        self._client = httpx.AsyncClient(
+            timeout=settings.http_timeout_seconds,
+            transport=SafeAsyncHTTPTransport(limits=download_limits()),
+        )
+        self._slots = asyncio.Semaphore(concurrency)
+        self._host_slots: dict[str, asyncio.Semaphore] = {}
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run ``coro`` on the engine's loop and block until it finishes."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def close(self) -> None:
+        self.run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._executor.shutdown(wait=False)
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str) -> AsyncIterator[None]:
+        # Same per-origin cap as app.ingest.http.host_slot, for this loop.
+        host = urlparse(url).hostname or ""
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(settings.download_max_connections_per_host)
+        async with slot:
+            yield
+
+    async def _download_once(
+        self, url: str, storage_key: str | None, body: _SpooledBody, *, spool: bool
+    ) -> DownloadResult:
+        if body.complete:
+            client = get_minio_client()
+            await asyncio.to_thread(ensure_bucket, client)
+            return await asyncio.to_thread(_upload_spooled, client, (), storage_key, body.mime_type, body)
+
+        await asyncio.to_thread(assert_safe_fetch_url, url)
+
+        async with self._host_slot(url):
+            t0 = time.perf_counter()
+            async with self._client.stream("GET", url, headers=body.request_headers(), follow_redirects=True) as r:
+                headers_at = time.perf_counter()
+                DOWNLOAD_TTFB_SECONDS.labels("async").observe(headers_at - t0)
+                if r.status_code in (429, 503):
+                    raise RateLimited(url, r.status_code, _parse_retry_after(r.headers.get("retry-after")))
+                body.begin(r)
+                r.raise_for_status()
+                mime_type = r.headers.get("content-type")
+
+                length = _known_length(r)
+                if length is not None and length > settings.max_download_bytes:
+                    raise ValueError(f"File too large (> {settings.max_download_bytes} bytes)")
+
+                client = get_minio_client()
+                await asyncio.to_thread(ensure_bucket, client)
+
+                if spool or length is None or storage_key is None:
+                    upload = partial(_upload_spooled, client, storage_key=storage_key, mime_type=mime_type, body=body)
+                else:
+                    upload = partial(_upload_streaming, client, storage_key=storage_key, mime_type=mime_type, length=length)
+                res = await _pipe_to_thread(r.aiter_bytes(), upload)
+        _observe_transfer("async", res, time.perf_counter() - headers_at)
+        return res
+
+    async def download(self, url: str, storage_key: str | None) -> DownloadResult:
+        """Async counterpart of :func:`~app.ingest.downloader.download_to_minio`, same retry policy."""
+        async with self._slots:
+            t0 = time.perf_counter()
+            outcome = "error"
+            body = _SpooledBody()
+            try:
+                async for attempt in AsyncRetrying(
+                    stop=stop_after_attempt(5),
+                    wait=wait_exponential(multiplier=1, min=1, max=30),
+                    retry=retry_if_not_exception_type(RateLimited),
+                    before_sleep=count_retry("download"),
+                ):
+                    with attempt:
+                        res = await self._download_once(
+                            url, storage_key, body, spool=attempt.retry_state.attempt_number > 1
+                        )
+                outcome = "ok"
+                return res
+            except RateLimited:
+                outcome = "rate_limited"
+                raise
+            finally:
+                await asyncio.to_thread(body.close)
+                DOWNLOAD_SECONDS.labels("async", outcome).observe(time.perf_counter() - t0)
+
+
+# Process-wide engine; created lazily in each worker process.
+_engine: AsyncDownloadEngine | None = None
+_lock = threading.Lock()
+
+
+def get_download_engine() -> AsyncDownloadEngine:
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = AsyncDownloadEngine(settings.async_download_concurrency)
+    return _engine
+
+
+def close_download_engine() -> None:
+    global _engine
+    with _lock:
+        if _engine is not None:
+            _engine.close()
+        _engine = None
+
+
+def _forget_after_fork() -> None:
+    # The loop thread does not exist in the child.
+    global _engine, _lock
+    _engine = None
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_after_fork)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from minio import Minio
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.bulk import dialect_insert
+from app.db.models import Asset, Blob
+from app.ingest.downloader import DownloadResult
+from app.ingest.storage import get_minio_client, object_exists
+
+
+class BlobGone(Exception):
+    """The blob's object was, or is about to be, removed by the garbage collector; download again."""
+
+
+def acquire_blob(db: Session, asset: Asset, res: DownloadResult) -> None:
+    """Point ``asset`` at the content-addressed blob of ``res`` and take a reference.
+
+    Runs in the caller's transaction, so the reference and the asset update
+    commit together. Raises :class:`BlobGone` if the blob row is marked
+    ``deleting`` (its object goes, even if this download just uploaded it),
+    or if the download skipped its upload and the object has since been
+    removed along with its row.
+    """
+    row = db.execute(select(Blob.deleting).where(Blob.sha256 == res.sha256).with_for_update()).first()
+    if row is not None and row.deleting:
+        raise BlobGone(res.sha256)
+    # Without a row the collector cannot touch the object, so this check holds.
+    if row is None and res.deduplicated and not object_exists(get_minio_client(), res.storage_key):
+        raise BlobGone(res.sha256)
+
+    insert = dialect_insert(db)
+    stmt = insert(Blob).values(
+        sha256=res.sha256,
+        storage_key=res.storage_key,
+        size_bytes=res.size_bytes,
+        mime_type=res.mime_type,
+        ref_count=1,
+        deleting=False,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Blob.sha256],
+        set_={"ref_count": Blob.ref_count + 1, "updated_at": func.now()},
+        where=Blob.deleting.is_(False),
+    ).returning(Blob.sha256)
+    if db.execute(stmt).first() is None:
+        raise BlobGone(res.sha256)
+    asset.blob_sha256 = res.sha256
+
+
+def release_blob(db: Session, asset: Asset) -> None:
+    """Drop ``asset``'s reference to its blob.
+
+    The object itself is left in place; :func:`collect_garbage_blobs` removes
+    it once the blob has stayed unreferenced for ``blob_gc_grace_seconds``.
+    Until the collector marks the row ``deleting``, a new download of the
+    same content can take a reference again and keep it.
+    """
+    if asset.blob_sha256 is None:
+        return
+    drop_blob_reference(db, asset.blob_sha256)
+    asset.blob_sha256 = None
+
+
+def drop_blob_reference(db: Session, sha256: str) -> None:
+    """Decrement the blob's ``ref_count`` (not below 0). Does not commit."""
+    blob = db.execute(select(Blob).where(Blob.sha256 == sha256).with_for_update()).scalar_one_or_none()
+    if blob is not None and blob.ref_count > 0:
+        blob.ref_count -= 1
+
+
+def record_unreferenced_blob(db: Session, res: DownloadResult) -> None:
+    """Register an uploaded object that no asset will reference, so the collector removes it.
+
+    For a download whose asset was deleted meanwhile. The row starts at
+    ``ref_count=0``; an existing row already accounts for the object. Does
+    not commit.
+    """
+    insert = dialect_insert(db)
+    stmt = insert(Blob).values(
+        sha256=res.sha256,
+        storage_key=res.storage_key,
+        size_bytes=res.size_bytes,
+        mime_type=res.mime_type,
+        ref_count=0,
+        deleting=False,
+    )
+    db.execute(stmt.on_conflict_do_nothing(index_elements=[Blob.sha256]))
+
+
+def collect_garbage_blobs(db: Session, client: Minio, *, limit: int = 500) -> int:
+    """Delete blobs unreferenced for ``blob_gc_grace_seconds``, objects first; returns how many.
+
+    Candidates are first marked ``deleting`` in their own commit, from then
+    on :func:`acquire_blob` refuses them. Each object is then removed while
+    its row is locked, and the row is deleted afterwards. A run that fails
+    part-way leaves rows ``deleting``; the next run finishes them.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.blob_gc_grace_seconds)
+    claimed = (
+        db.execute(
+            select(Blob)
+            .where(Blob.ref_count <= 0, Blob.updated_at < cutoff, Blob.deleting.is_(False))
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        .scalars()
+        .all()
+    )
+    for blob in claimed:
+        blob.deleting = True
+    db.commit()
+
+    removed = 0
+    for sha256 in db.scalars(select(Blob.sha256).where(Blob.deleting.is_(True)).limit(limit)).all():
+        blob = db.execute(
+            select(Blob).where(Blob.sha256 == sha256, Blob.deleting.is_(True)).with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if blob is None:  # gone, or another collector has it
+            db.rollback()
+            continue
+        client.remove_object(settings.s3_bucket, blob.storage_key)
+        db.delete(blob)
+        db.commit()
+        removed += 1
+    return removed
@@ -2,14 +2,27 @@ from __future__ import annotations
 
 import hashlib
 import os
+import re
 import tempfile
+import time
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
 
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
+from minio import Minio
+from tenacity import Retrying, retry_if_not_exception_type, stop_after_attempt, wait_exponential
 
 from app.core.config import settings
-from app.ingest.storage import ensure_bucket, get_minio_client
+from app.core.metrics import (
+    DOWNLOAD_BYTES,
+    DOWNLOAD_SECONDS,
+    DOWNLOAD_THROUGHPUT,
+    DOWNLOAD_TTFB_SECONDS,
+    count_retry,
+)
+from app.ingest.http import get_http_client, host_slot
+from app.ingest.storage import content_key, ensure_bucket, get_minio_client, object_exists
 from app.ingest.url_safety import assert_safe_fetch_url
 
 
@@ -19,48 +32,301 @@ class DownloadResult:
     sha256: str
     mime_type: str | None
     size_bytes: int
+    deduplicated: bool = False  # content-addressed blob already existed; upload skipped
 
 
-@retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=1, max=30))
-def download_to_minio(url: str, storage_key: str) -> DownloadResult:
-    assert_safe_fetch_url(url)
+class RateLimited(Exception):
+    """The origin answered 429/503. Not retried in place; the scheduler defers the task."""
 
-    h = hashlib.sha256()
-    mime_type: str | None = None
-    size = 0
+    def __init__(self, url: str, status_code: int, retry_after: float | None) -> None:
+        super().__init__(f"{url} answered {status_code} (Retry-After: {retry_after})")
+        self.status_code = status_code
+        self.retry_after = retry_after
 
-    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-        tmp_path = tmp.name
 
+def _parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
     try:
-        with httpx.stream("GET", url, timeout=settings.http_timeout_seconds, follow_redirects=True) as r:
-            r.raise_for_status()
-            mime_type = r.headers.get("content-type")
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
-            with open(tmp_path, "wb") as f:
-                for chunk in r.iter_bytes():
-                    if not chunk:
-                        continue
-                    size += len(chunk)
-                    if size > settings.max_download_bytes:
-                        raise ValueError(f"File too large (> {settings.max_download_bytes} bytes)")
-                    h.update(chunk)
-                    f.write(chunk)
 
-        client = get_minio_client()
-        ensure_bucket(client)
+class _HashingStream:
+    """Read-only file object over a response body, hashing and size-checking in flight."""
+
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        self._chunks = chunks
+        self._buf = bytearray()
+        self._eof = False
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def _pull(self) -> None:
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._eof = True
+            return
+        self.size += len(chunk)
+        if self.size > settings.max_download_bytes:
+            raise ValueError(f"File too large (> {settings.max_download_bytes} bytes)")
+        self.sha256.update(chunk)
+        self._buf += chunk
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buf) < size):
+            self._pull()
+        if size < 0 or size >= len(self._buf):
+            data = bytes(self._buf)
+            self._buf.clear()
+        else:
+            data = bytes(self._buf[:size])
+            del self._buf[:size]
+        return data
+
+
+def _known_length(r: httpx.Response) -> int | None:
+    # With a content-encoding, Content-Length counts compressed bytes while
+    # iter_bytes() yields decoded ones; treat the length as unknown.
+    if r.headers.get("content-encoding", "identity").lower() != "identity":
+        return None
+    try:
+        return int(r.headers["content-length"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _upload_streaming(client: Minio, chunks: Iterable[bytes], storage_key: str, mime_type: str | None, length: int) -> DownloadResult:
+    body = _HashingStream(iter(chunks))
+    client.put_object(
+        bucket_name=settings.s3_bucket,
+        object_name=storage_key,
+        data=body,
+        length=length,
+        content_type=mime_type or "application/octet-stream",
+        part_size=settings.s3_part_size_bytes,
+    )
+    if body.size != length:
+        raise ValueError(f"Body length {body.size} does not match Content-Length {length}")
+    return DownloadResult(storage_key=storage_key, sha256=body.sha256.hexdigest(), mime_type=mime_type, size_bytes=body.size)
+
+
+_content_range_re = re.compile(r"bytes (\d+)-\d+/(\d+|\*)")
+
+
+class _SpooledBody:
+    """Body bytes spooled to a temporary file, kept across download attempts.
+
+    After a failed attempt the file, the running SHA-256 and the size stay
+    as they were, and :meth:`request_headers` asks the origin for the rest
+    with ``Range``/``If-Range``. :meth:`begin` then keeps the bytes for a
+    ``206`` that continues where they end and starts over otherwise (the
+    origin ignores ranges, or the body changed and ``If-Range`` got a full
+    ``200``). Once the whole body is spooled, :attr:`complete` is set and a
+    retry after a failed upload only uploads again.
+    """
+
+    def __init__(self) -> None:
+        self.path: str | None = None
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.expected_size: int | None = None
+        self.mime_type: str | None = None
+        self.complete = False
+        self._validator: str | None = None  # strong ETag or Last-Modified of the body being received
+
+    def request_headers(self) -> dict[str, str]:
+        if not self.size or self._validator is None:
+            return {}
+        return {"Range": f"bytes={self.size}-", "If-Range": self._validator}
+
+    def reset(self) -> None:
+        if self.path is not None:
+            os.truncate(self.path, 0)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.expected_size = None
+        self.complete = False
+        self._validator = None
+
+    def begin(self, r: httpx.Response) -> None:
+        """Match the spooled bytes to response ``r`` before its body is read."""
+        if r.status_code == 416:  # our offset is past the current body
+            self.reset()
+            return
+        if not r.is_success:
+            return  # transient error; keep the bytes for the next attempt
+        encoded = r.headers.get("content-encoding", "identity").lower() != "identity"
+        self.mime_type = r.headers.get("content-type")
+        if r.status_code == 206:
+            m = _content_range_re.fullmatch(r.headers.get("content-range", ""))
+            if encoded or m is None or int(m.group(1)) != self.size:
+                self.reset()
+                raise ValueError(f"Unusable range response (Content-Range: {r.headers.get('content-range')})")
+            self.expected_size = None if m.group(2) == "*" else int(m.group(2))
+            return
+
+        self.reset()
+        self.expected_size = _known_length(r)
+        # Ranges count encoded bytes, but we spool decoded ones.
+        if not encoded and r.headers.get("accept-ranges", "").lower() != "none":
+            etag = r.headers.get("etag")
+            self._validator = etag if etag and not etag.startswith("W/") else r.headers.get("last-modified")
+
+    def write(self, chunks: Iterable[bytes]) -> None:
+        if self.path is None:
+            fd, self.path = tempfile.mkstemp(prefix="dnbkb-download-")
+            os.close(fd)
+        with open(self.path, "r+b") as f:
+            # Drop anything a failed write left past the hashed bytes.
+            f.seek(self.size)
+            f.truncate()
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if self.size + len(chunk) > settings.max_download_bytes:
+                    raise ValueError(f"File too large (> {settings.max_download_bytes} bytes)")
+                f.write(chunk)
+                self.sha256.update(chunk)
+                self.size += len(chunk)
+        if self.expected_size is not None and self.size != self.expected_size:
+            size = self.size
+            self.reset()
+            raise ValueError(f"Body length {size} does not match the announced {self.expected_size}")
+        self.complete = True
+
+    def close(self) -> None:
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+def _upload_spooled(
+    client: Minio,
+    chunks: Iterable[bytes],
+    storage_key: str | None,
+    mime_type: str | None,
+    body: _SpooledBody | None = None,
+) -> DownloadResult:
+    """Spool the rest of the body into ``body`` (a new one if ``None``), then upload the file."""
+    owned = body is None
+    if body is None:
+        body = _SpooledBody()
+
+    try:
+        body.write(chunks)
+        tmp_path = body.path
+        size = body.size
+        sha256 = body.sha256.hexdigest()
+        deduplicated = False
+        if storage_key is None:
+            storage_key = content_key(sha256)
+            deduplicated = object_exists(client, storage_key)
 
         # Upload
-        client.fput_object(
-            bucket_name=settings.s3_bucket,
-            object_name=storage_key,
-            file_path=tmp_path,
-            content_type=mime_type,
+        if not deduplicated:
+            client.fput_object(
+                bucket_name=settings.s3_bucket,
+                object_name=storage_key,
+                file_path=tmp_path,
+                content_type=mime_type or "application/octet-stream",
+                part_size=settings.s3_part_size_bytes,
+            )
+
+        return DownloadResult(
+            storage_key=storage_key,
+            sha256=sha256,
+            mime_type=mime_type,
+            size_bytes=size,
+            deduplicated=deduplicated,
         )
+    finally:
+        if owned:
+            body.close()
+
+
+def _observe_transfer(mode: str, res: DownloadResult, seconds: float) -> None:
+    DOWNLOAD_BYTES.labels(mode).inc(res.size_bytes)
+    if seconds > 0:
+        DOWNLOAD_THROUGHPUT.labels(mode).observe(res.size_bytes / seconds)
+
+
+def _download_once(url: str, storage_key: str | None, body: _SpooledBody, *, spool: bool) -> DownloadResult:
+    if body.complete:
+        client = get_minio_client()
+        ensure_bucket(client)
+        return _upload_spooled(client, (), storage_key, body.mime_type, body)
 
-        return DownloadResult(storage_key=storage_key, sha256=h.hexdigest(), mime_type=mime_type, size_bytes=size)
+    assert_safe_fetch_url(url)
+
+    with host_slot(url):
+        t0 = time.perf_counter()
+        with get_http_client().stream("GET", url, headers=body.request_headers(), follow_redirects=True) as r:
+            headers_at = time.perf_counter()
+            DOWNLOAD_TTFB_SECONDS.labels("sync").observe(headers_at - t0)
+            if r.status_code in (429, 503):
+                raise RateLimited(url, r.status_code, _parse_retry_after(r.headers.get("retry-after")))
+            body.begin(r)
+            r.raise_for_status()
+            mime_type = r.headers.get("content-type")
+
+            length = _known_length(r)
+            if length is not None and length > settings.max_download_bytes:
+                raise ValueError(f"File too large (> {settings.max_download_bytes} bytes)")
+
+            client = get_minio_client()
+            ensure_bucket(client)
+
+            # Content-addressed keys need the hash before the upload starts.
+            if spool or length is None or storage_key is None:
+                res = _upload_spooled(client, r.iter_bytes(), storage_key, mime_type, body)
+            else:
+                res = _upload_streaming(client, r.iter_bytes(), storage_key, mime_type, length)
+    _observe_transfer("sync", res, time.perf_counter() - headers_at)
+    return res
+
+
+def download_to_minio(url: str, storage_key: str | None) -> DownloadResult:
+    """Download ``url`` into the bucket under ``storage_key``.
+
+    With ``storage_key=None`` the object is stored content-addressed under
+    :func:`~app.ingest.storage.content_key`, and the upload is skipped when
+    that blob already exists.
+
+    The first attempt pipes the body straight into a multipart upload when the
+    origin announces its length. Bodies of unknown length, and every retry,
+    go through a temporary file instead, since a half-consumed response
+    stream cannot be replayed. Content-addressed downloads are always spooled.
+    A spooled attempt that fails keeps its bytes and hash state, and the next
+    attempt resumes with a ``Range`` request (see :class:`_SpooledBody`).
+    Throttling answers raise :class:`RateLimited` at once instead of sleeping.
+    """
+    t0 = time.perf_counter()
+    outcome = "error"
+    body = _SpooledBody()
+    try:
+        for attempt in Retrying(
+            stop=stop_after_attempt(5),
+            wait=wait_exponential(multiplier=1, min=1, max=30),
+            retry=retry_if_not_exception_type(RateLimited),
+            before_sleep=count_retry("download"),
+        ):
+            with attempt:
+                res = _download_once(url, storage_key, body, spool=attempt.retry_state.attempt_number > 1)
+        outcome = "ok"
+        return res
+    except RateLimited:
+        outcome = "rate_limited"
+        raise
     finally:
-        try:
-            os.remove(tmp_path)
-        except OSError:
-            pass
+        body.close()
+        DOWNLOAD_SECONDS.labels("sync", outcome).observe(time.perf_counter() - t0)
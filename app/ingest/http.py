@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import anyio
+import httpcore
+import httpx
+
+from app.core.config import settings
+from app.ingest.url_safety import resolver
+
+# Process-wide client; recreated per worker process (see app.worker.celery_app).
+_client: httpx.Client | None = None
+_host_slots: dict[str, threading.BoundedSemaphore] = {}
+_lock = threading.Lock()
+
+
+class _PinnedNetworkBackend(httpcore.SyncBackend):
+    """Connects to the addresses vetted by :data:`~app.ingest.url_safety.resolver`.
+
+    Every connection, including ones opened for redirects, goes through the
+    SSRF check, and the IP dialled is the one that was checked. TLS still
+    verifies against the hostname, which httpcore passes to ``start_tls``.
+    """
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        last_error: Exception | None = None
+        for ip in resolver.resolve(host, port):
+            try:
+                return super().connect_tcp(
+                    ip, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        assert last_error is not None
+        raise last_error
+
+
+class _PinnedAsyncNetworkBackend(httpcore.AnyIOBackend):
+    """Async twin of :class:`_PinnedNetworkBackend`; DNS runs in a worker thread."""
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        last_error: Exception | None = None
+        for ip in await anyio.to_thread.run_sync(resolver.resolve, host, port):
+            try:
+                return await super().connect_tcp(
+                    ip, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        assert last_error is not None
+        raise last_error
+
+
+def _pool_options(limits: httpx.Limits) -> dict:
+    return {
+        "ssl_context": httpx.create_ssl_context(),
+        "max_connections": limits.max_connections,
+        "max_keepalive_connections": limits.max_keepalive_connections,
+        "keepalive_expiry": limits.keepalive_expiry,
+    }
+
+
+class SafeHTTPTransport(httpx.HTTPTransport):
+    """``httpx.HTTPTransport`` over a connection pool that dials through :class:`_PinnedNetworkBackend`.
+
+    httpx takes no network backend, so the base ``__init__`` is not called:
+    it would only build a pool to be thrown away. Request handling,
+    exception mapping and closing use nothing but ``self._pool``.
+    """
+
+    def __init__(self, *, limits: httpx.Limits) -> None:
+        self._pool = httpcore.ConnectionPool(**_pool_options(limits), network_backend=_PinnedNetworkBackend())
+
+
+class SafeAsyncHTTPTransport(httpx.AsyncHTTPTransport):
+    """Async twin of :class:`SafeHTTPTransport`."""
+
+    def __init__(self, *, limits: httpx.Limits) -> None:
+        self._pool = httpcore.AsyncConnectionPool(
+            **_pool_options(limits), network_backend=_PinnedAsyncNetworkBackend()
+        )
+
+
+def download_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.download_max_connections,
+        max_keepalive_connections=settings.download_max_connections,
+        keepalive_expiry=settings.download_keepalive_expiry_seconds,
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """Return this process's shared keep-alive client for asset downloads."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(
+                    timeout=settings.http_timeout_seconds,
+                    transport=SafeHTTPTransport(limits=download_limits()),
+                )
+    return _client
+
+
+def close_http_client() -> None:
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def _forget_after_fork() -> None:
+    # The child must not use (or close) sockets shared with its parent.
+    global _client, _lock
+    _client = None
+    _host_slots.clear()
+    resolver.clear()
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_after_fork)
+
+
+@contextmanager
+def host_slot(url: str) -> Iterator[None]:
+    """Hold one of ``download_max_connections_per_host`` slots for the URL's host.
+
+    httpx only limits connections per client, not per origin; this keeps a
+    threaded worker from opening its whole pool against a single host.
+    """
+    host = urlparse(url).hostname or ""
+    with _lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(settings.download_max_connections_per_host)
+    with slot:
+        yield
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.ingest.storage import get_minio_client
+
+
+@dataclass(frozen=True)
+class PresignedUrl:
+    url: str
+    expires_at: datetime
+
+    def expires_in_seconds(self, now: datetime | None = None) -> int:
+        now = now or datetime.now(timezone.utc)
+        return max(0, int((self.expires_at - now).total_seconds()))
+
+
+class PresignCache:
+    """Process-local LRU of presigned GET URLs, keyed by ``(bucket, object key)``.
+
+    An entry is handed out again until ``refresh_margin`` before it expires,
+    so every URL returned is valid for at least that long. Route handlers run
+    on a thread pool, hence the lock.
+    """
+
+    def __init__(self, *, max_entries: int, expiry: timedelta, refresh_margin: timedelta) -> None:
+        if refresh_margin >= expiry:
+            raise ValueError("presign refresh margin must be shorter than the expiry")
+        self.max_entries = max_entries
+        self.expiry = expiry
+        self.refresh_margin = refresh_margin
+        self._entries: OrderedDict[tuple[str, str], PresignedUrl] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, bucket: str, key: str) -> PresignedUrl:
+        # X-Amz-Date has whole seconds; truncate so expires_at is not later than S3's.
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        with self._lock:
+            item = self._entries.get((bucket, key))
+            if item is not None and item.expires_at - self.refresh_margin > now:
+                self._entries.move_to_end((bucket, key))
+                return item
+
+        # Signing is local; MinIO is only asked for the bucket region once per client.
+        url = get_minio_client().presigned_get_object(
+            bucket_name=bucket,
+            object_name=key,
+            expires=self.expiry,
+            request_date=now,
+        )
+        item = PresignedUrl(url=url, expires_at=now + self.expiry)
+        with self._lock:
+            self._entries[(bucket, key)] = item
+            self._entries.move_to_end((bucket, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return item
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache: PresignCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_presign_cache() -> PresignCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PresignCache(
+                    max_entries=settings.presign_cache_max_entries,
+                    expiry=timedelta(seconds=settings.presign_expiry_seconds),
+                    refresh_margin=timedelta(seconds=settings.presign_refresh_margin_seconds),
+                )
+    return _cache
+
+
+def presign_object(key: str) -> PresignedUrl:
+    """Presigned GET URL for ``key`` in the asset bucket, cached until shortly before expiry."""
+    return get_presign_cache().get(settings.s3_bucket, key)
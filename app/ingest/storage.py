@@ -1,25 +1,102 @@
 from __future__ import annotations
 
+import os
+import threading
+
+import certifi
+import urllib3
 from minio import Minio
 from minio.error import S3Error
+from urllib3.util import Retry, Timeout
 
 from app.core.config import settings
 
+# Process-wide client; recreated per worker process (see app.worker.celery_app).
+_client: Minio | None = None
+_http: urllib3.PoolManager | None = None
+_ready_buckets: set[str] = set()
+_lock = threading.Lock()
 
-def get_minio_client() -> Minio:
-    return Minio(
-        settings.s3_endpoint,
-        access_key=settings.s3_access_key,
-        secret_key=settings.s3_secret_key,
-        secure=settings.s3_secure,
+
+def _new_pool_manager() -> urllib3.PoolManager:
+    # Same settings as Minio's default pool, with a configurable size.
+    timeout = 5 * 60
+    maxsize = settings.s3_max_connections
+    if settings.ingest_mode == "async":
+        # Every concurrent transfer holds one upload connection.
+        maxsize = max(maxsize, settings.async_download_concurrency)
+    return urllib3.PoolManager(
+        timeout=Timeout(connect=timeout, read=timeout),
+        maxsize=maxsize,
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
     )
 
 
+def get_minio_client() -> Minio:
+    """Return this process's shared, connection-pooled MinIO client."""
+    global _client, _http
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _http = _new_pool_manager()
+                _client = Minio(
+                    settings.s3_endpoint,
+                    access_key=settings.s3_access_key,
+                    secret_key=settings.s3_secret_key,
+                    secure=settings.s3_secure,
+                    region=settings.s3_region,
+                    http_client=_http,
+                )
+    return _client
+
+
+def close_minio_client() -> None:
+    global _client, _http
+    with _lock:
+        if _http is not None:
+            _http.clear()
+        _client = None
+        _http = None
+        _ready_buckets.clear()
+
+
+def _forget_after_fork() -> None:
+    # The child must not use (or close) sockets shared with its parent.
+    global _client, _http, _lock
+    _client = None
+    _http = None
+    _ready_buckets.clear()
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_after_fork)
+
+
 def ensure_bucket(client: Minio) -> None:
     bucket = settings.s3_bucket
+    if bucket in _ready_buckets:
+        return
     try:
         if not client.bucket_exists(bucket):
             client.make_bucket(bucket)
     except S3Error:
         # In a race (api + worker) bucket may be created simultaneously.
         pass
+    _ready_buckets.add(bucket)
+
+
+def content_key(sha256: str) -> str:
+    """Object key for a content-addressed blob."""
+    return f"sha256/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def object_exists(client: Minio, object_name: str) -> bool:
+    try:
+        client.stat_object(settings.s3_bucket, object_name)
+    except S3Error as e:
+        if e.code in {"NoSuchKey", "NoSuchObject", "ResourceNotFound"}:
+            return False
+        raise
+    return True
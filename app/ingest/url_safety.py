@@ -2,8 +2,14 @@ from __future__ import annotations
 
 import ipaddress
 import socket
+import threading
+import time
+from collections.abc import Callable
 from urllib.parse import urlparse
 
+from app.core.config import settings
+from app.core.metrics import DNS_CACHE_LOOKUPS
+
 
 class UnsafeUrlError(ValueError):
     pass
@@ -25,6 +31,115 @@ def _is_bad_ip(ip: str) -> bool:
     )
 
 
+class SafeResolver:
+    """Resolves hostnames to vetted IPs, with a TTL-bounded cache.
+
+    Both outcomes are cached: the list of allowed addresses, and the reason a
+    host was refused (DNS failure or a disallowed address), the latter for
+    the shorter ``negative_ttl``. The HTTP transport connects through
+    :meth:`resolve` too (see ``app.ingest.http``), so the socket goes to
+    exactly an address that passed the check, with no second lookup that a
+    rebinding DNS server could answer differently.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float,
+        negative_ttl: float,
+        max_entries: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: dict[str, tuple[float, tuple[str, ...] | None, str | None]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def resolve(self, host: str, port: int) -> tuple[str, ...]:
+        """Return the allowed addresses for ``host`` or raise :class:`UnsafeUrlError`."""
+        # If host is an IP literal
+        try:
+            ipaddress.ip_address(host)
+        except ValueError:
+            pass
+        else:
+            if _is_bad_ip(host):
+                raise UnsafeUrlError("IP address is not allowed")
+            return (host,)
+
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is not None and entry[0] > now:
+                _, ips, error = entry
+                if ips is not None:
+                    self.hits += 1
+                    DNS_CACHE_LOOKUPS.labels("hit").inc()
+                    return ips
+                self.negative_hits += 1
+                DNS_CACHE_LOOKUPS.labels("negative_hit").inc()
+                raise UnsafeUrlError(error)
+            self.misses += 1
+        DNS_CACHE_LOOKUPS.labels("miss").inc()
+
+        try:
+            ips = self._lookup(host, port)
+        except UnsafeUrlError as e:
+            self._store(host, now + self.negative_ttl, None, str(e))
+            raise
+        self._store(host, now + self.ttl, ips, None)
+        return ips
+
+    def _lookup(self, host: str, port: int) -> tuple[str, ...]:
+        # Resolve hostname
+        try:
+            infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise UnsafeUrlError(f"DNS resolution failed for host {host}: {e}") from e
+
+        ips: list[str] = []
+        for info in infos:
+            ip = info[4][0]
+            if _is_bad_ip(ip):
+                raise UnsafeUrlError(f"Hostname resolves to disallowed IP: {ip}")
+            if ip not in ips:
+                ips.append(ip)
+        return tuple(ips)
+
+    def _store(self, host: str, expires_at: float, ips: tuple[str, ...] | None, error: str | None) -> None:
+        with self._lock:
+            self._entries.pop(host, None)
+            while len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[host] = (expires_at, ips, error)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+resolver = SafeResolver(
+    ttl=settings.dns_cache_ttl_seconds,
+    negative_ttl=settings.dns_negative_ttl_seconds,
+    max_entries=settings.dns_cache_max_entries,
+)
+
+
 def assert_safe_fetch_url(url: str) -> None:
     p = urlparse(url)
     if p.scheme not in {"http", "https"}:
@@ -32,24 +147,4 @@ def assert_safe_fetch_url(url: str) -> None:
     if not p.hostname:
         raise UnsafeUrlError("URL is missing hostname")
 
-    host = p.hostname
-
-    # If host is an IP literal
-    try:
-        ipaddress.ip_address(host)
-        if _is_bad_ip(host):
-            raise UnsafeUrlError("IP address is not allowed")
-        return
-    except ValueError:
-        pass
-
-    # Resolve hostname
-    try:
-        infos = socket.getaddrinfo(host, p.port or (443 if p.scheme == "https" else 80), type=socket.SOCK_STREAM)
-    except socket.gaierror as e:
-        raise UnsafeUrlError(f"DNS resolution failed for host {host}: {e}") from e
-
-    for info in infos:
-        ip = info[4][0]
-        if _is_bad_ip(ip):
-            raise UnsafeUrlError(f"Hostname resolves to disallowed IP: {ip}")
+    resolver.resolve(p.hostname, p.port or (443 if p.scheme == "https" else 80))
@@ -1,16 +1,38 @@
 from __future__ import annotations
 
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routes import router
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
 from app.db.init_db import init_db
+from app.dnb.cache import SruResponseCache
+from app.dnb.sru_client import SruClient
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # One pooled SRU client per process, shared by all requests.
+    async with SruClient(cache=SruResponseCache.from_settings()) as sru_client:
+        app.state.sru_client = sru_client
+        yield
 
 
 def create_app() -> FastAPI:
     init_db()
 
-    app = FastAPI(title="DNB Knowledge Base API", version="0.1.0")
+    app = FastAPI(title="DNB Knowledge Base API", version="0.1.0", lifespan=lifespan)
+
+    # add_middleware() wraps what is already there, so the first one added is
+    # the innermost: profiling covers the route and nothing else, and CORS
+    # headers also reach profile responses (X-Profile: speedscope/html).
+    if settings.profiling_enabled:
+        app.add_middleware(ProfilingMiddleware)
 
     # Dev-friendly CORS (tighten in production)
     app.add_middleware(
@@ -21,6 +43,8 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    app.add_middleware(MetricsMiddleware)
+
     app.include_router(router)
     return app
 
@@ -1,8 +1,27 @@
 from __future__ import annotations
 
+import logging
+import os
+import time
+
 from celery import Celery
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+)
 
+from app.core import metrics
 from app.core.config import settings
+from app.ingest.async_downloader import close_download_engine
+from app.ingest.http import close_http_client, get_http_client
+from app.ingest.storage import close_minio_client, ensure_bucket, get_minio_client
+from app.ingest.url_safety import resolver
+
+logger = logging.getLogger(__name__)
 
 celery_app = Celery(
     "dnbkb",
@@ -16,7 +35,71 @@ celery_app.conf.update(
     accept_content=["json"],
     task_track_started=True,
     broker_connection_retry_on_startup=True,
+    task_routes={
+        "harvest_query": {"queue": settings.celery_harvest_queue},
+        "ingest_query": {"queue": settings.celery_harvest_queue},
+    },
+    # Only takes effect when a `celery beat` process runs.
+    beat_schedule={
+        "gc-blobs": {"task": "gc_blobs", "schedule": 3600.0},
+    },
 )
 
 # Auto-discover tasks
 celery_app.autodiscover_tasks(["app.worker"])
+
+
+def send_asset_batch(asset_ids: list[str], headers: dict | None = None) -> None:
+    """Enqueue an ``ingest_asset_batch``; if it raises, ``fail_asset_batch`` fails its unfinished assets."""
+    celery_app.send_task(
+        "ingest_asset_batch",
+        args=[asset_ids],
+        headers=headers,
+        link_error=celery_app.signature("fail_asset_batch", args=[asset_ids]),
+    )
+
+
+@before_task_publish.connect
+def _stamp_publish_time(headers: dict | None = None, **_kwargs) -> None:
+    # Overwrite on retries too: each publish starts a new wait in the queue.
+    if headers is not None:
+        headers[metrics.PUBLISHED_AT_HEADER] = time.time()
+
+
+@task_prerun.connect
+def _task_started(task=None, **_kwargs) -> None:
+    metrics.task_started(task)
+
+
+@task_postrun.connect
+def _task_finished(task=None, state: str | None = None, **_kwargs) -> None:
+    metrics.task_finished(task, state)
+
+
+@worker_init.connect
+def _start_metrics_exporter(sender=None, **_kwargs) -> None:
+    if not metrics.ENABLED or settings.worker_metrics_port is None:
+        return
+    if not metrics.MULTIPROCESS and "prefork" in str(getattr(sender, "pool_cls", "")):
+        logger.warning("PROMETHEUS_MULTIPROC_DIR is not set; metrics of prefork children will be missing")
+    metrics.start_exporter(settings.worker_metrics_port)
+
+
+@worker_process_init.connect
+def _open_process_clients(**_kwargs) -> None:
+    # Inherited clients were already dropped by the at-fork hooks.
+    get_http_client()
+    try:
+        ensure_bucket(get_minio_client())
+    except Exception:
+        # MinIO may not be up yet; downloads will retry the check.
+        pass
+
+
+@worker_process_shutdown.connect
+def _close_process_clients(**_kwargs) -> None:
+    logger.info("DNS cache stats: %s", resolver.stats())
+    metrics.mark_process_dead(os.getpid())
+    close_download_engine()
+    close_http_client()
+    close_minio_client()
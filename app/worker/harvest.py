@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.bulk import upsert_parsed_records
+from app.db.models import Harvest
+from app.db.session import SessionLocal
+from app.dnb.marc import RecordParseError
+from app.dnb.parallel import MarcParsePool
+from app.dnb.sru_client import SruClient, SruSearchResult
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HarvestProgress:
+    started: float
+    harvested: int = 0
+    failed: int = 0
+
+
+def log_parse_errors(harvest_id: str, page: SruSearchResult, errors: list[RecordParseError]) -> None:
+    for e in errors:
+        logger.warning("Harvest %s: record %d failed to parse: %s", harvest_id, page.start_record + e.position, e.error)
+
+
+def record_progress(
+    db: Session, harvest_id: str, page: SruSearchResult, parsed: int, failed: int, progress: HarvestProgress
+) -> None:
+    """Count a stored page towards ``progress`` and the harvest row. Does not commit."""
+    progress.harvested += parsed
+    progress.failed += failed
+    elapsed = time.monotonic() - progress.started
+    harvest = db.get(Harvest, harvest_id)
+    harvest.number_of_records = page.number_of_records
+    harvest.records_harvested = progress.harvested
+    harvest.records_failed = progress.failed
+    harvest.records_per_sec = progress.harvested / elapsed if elapsed > 0 else None
+
+
+def _store_page(harvest_id: str, page: SruSearchResult, pool: MarcParsePool, progress: HarvestProgress) -> None:
+    """Persist one page and the harvest progress in a single transaction."""
+    parsed, errors = pool.parse(page.records)
+    log_parse_errors(harvest_id, page, errors)
+
+    db = SessionLocal()
+    try:
+        upsert_parsed_records(db, parsed)
+        record_progress(db, harvest_id, page, len(parsed), len(errors), progress)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run_harvest(harvest_id: str, cql: str, max_records: int | None) -> HarvestProgress:
+    """Stream all pages of ``cql`` into the database, one transaction per page.
+
+    The next pages keep downloading while a page is being parsed and persisted
+    in a thread, but no more than ``harvest_concurrency`` pages are held at once.
+    """
+    progress = HarvestProgress(started=time.monotonic())
+    with MarcParsePool() as pool:
+        async with SruClient() as sru:
+            async for page in sru.harvest(
+                cql,
+                max_records=max_records,
+                page_size=settings.harvest_page_size,
+                concurrency=settings.harvest_concurrency,
+            ):
+                await asyncio.to_thread(_store_page, harvest_id, page, pool, progress)
+    return progress
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.bulk import add_job_assets, upsert_parsed_records
+from app.db.models import Link
+from app.db.session import SessionLocal
+from app.dnb.marc import ParsedRecord, RecordParseError
+from app.dnb.parallel import MarcParsePool
+from app.dnb.sru_client import SruClient, SruSearchResult
+from app.worker.celery_app import send_asset_batch
+from app.worker.harvest import HarvestProgress, log_parse_errors, record_progress
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # end-of-stream marker passed down the queues
+
+
+@dataclass
+class QueryIngestProgress(HarvestProgress):
+    assets: int = 0
+    batches: int = 0
+
+
+@dataclass
+class _ParsedPage:
+    page: SruSearchResult
+    parsed: list[ParsedRecord]
+    errors: list[RecordParseError]
+
+
+async def _stage(
+    inbox: asyncio.Queue, outbox: asyncio.Queue | None, fn: Callable, in_flight: set[asyncio.Task]
+) -> None:
+    """Run ``fn`` in a thread on every item of ``inbox``; results other than ``None`` go to ``outbox``.
+
+    Cancelling the stage does not stop a thread that is already running, so
+    its call is shielded and kept in ``in_flight`` until it returns.
+    """
+    while (item := await inbox.get()) is not _DONE:
+        call = asyncio.create_task(asyncio.to_thread(fn, item))
+        in_flight.add(call)
+        call.add_done_callback(in_flight.discard)
+        result = await asyncio.shield(call)
+        if outbox is not None and result is not None:
+            await outbox.put(result)
+    if outbox is not None:
+        await outbox.put(_DONE)
+
+
+class _QueryIngest:
+    """The blocking work of each stage, for one job."""
+
+    def __init__(self, job_id: str, harvest_id: str, link_kinds: list[str], pool: MarcParsePool) -> None:
+        self.job_id = job_id
+        self.harvest_id = harvest_id
+        self.link_kinds = link_kinds
+        self.pool = pool
+        self.progress = QueryIngestProgress(started=time.monotonic())
+        # Committed asset ids not yet sent in a batch. Kept here rather than
+        # only in the queue, so flush() still sends them if a stage fails.
+        self._pending: list[str] = []
+        self._lock = threading.Lock()
+
+    def parse(self, page: SruSearchResult) -> _ParsedPage:
+        parsed, errors = self.pool.parse(page.records)
+        log_parse_errors(self.harvest_id, page, errors)
+        return _ParsedPage(page, parsed, errors)
+
+    def store(self, item: _ParsedPage) -> int | None:
+        """Upsert a page and add its wanted links to the job, in one transaction."""
+        db = SessionLocal()
+        try:
+            upsert_parsed_records(db, item.parsed)
+            link_ids = []
+            if item.parsed:
+                link_ids = db.scalars(
+                    select(Link.id)
+                    .where(Link.record_idn.in_([p.idn for p in item.parsed]), Link.kind.in_(self.link_kinds))
+                    .order_by(Link.record_idn)
+                ).all()
+            assets = add_job_assets(db, self.job_id, link_ids)
+            record_progress(db, self.harvest_id, item.page, len(item.parsed), len(item.errors), self.progress)
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            self._pending += [a["id"] for a in assets]
+        self.progress.assets += len(assets)
+        return len(assets) or None
+
+    def enqueue(self, _added: int) -> None:
+        """Send every full batch of pending assets."""
+        while self._send(settings.ingest_batch_size):
+            pass
+
+    def flush(self) -> None:
+        """Send what is left, in batches."""
+        while self._send(1):
+            pass
+
+    def _send(self, at_least: int) -> bool:
+        size = settings.ingest_batch_size
+        with self._lock:
+            if not self._pending or len(self._pending) < at_least:
+                return False
+            batch = self._pending[:size]
+            del self._pending[:size]
+        try:
+            send_asset_batch(batch)
+        except Exception:
+            with self._lock:
+                self._pending[:0] = batch
+            raise
+        self.progress.batches += 1
+        return True
+
+
+def _stage_errors(eg: BaseExceptionGroup) -> list[BaseException]:
+    """The leaf exceptions of ``eg``, nested groups flattened."""
+    errors: list[BaseException] = []
+    for e in eg.exceptions:
+        errors.extend(_stage_errors(e) if isinstance(e, BaseExceptionGroup) else [e])
+    return errors
+
+
+async def run_query_ingest(
+    job_id: str, harvest_id: str, cql: str, max_records: int | None, link_kinds: list[str]
+) -> QueryIngestProgress:
+    """Harvest ``cql`` and enqueue downloads for the matching links as they are stored.
+
+    Four stages connected by bounded queues: SRU fetch (``harvest_concurrency``
+    requests in flight), MARC parsing, persistence (records, links and the
+    job's new assets, one transaction per page) and enqueueing of
+    ``ingest_asset_batch`` tasks. A full queue holds back the stage before it,
+    so a slow database slows the harvest down instead of the pages piling up
+    in memory. Downloads start while later pages are still being fetched.
+    """
+    pages: asyncio.Queue = asyncio.Queue(maxsize=settings.query_ingest_queue_pages)
+    parsed: asyncio.Queue = asyncio.Queue(maxsize=settings.query_ingest_queue_pages)
+    stored: asyncio.Queue = asyncio.Queue(maxsize=settings.query_ingest_queue_pages)
+
+    with MarcParsePool() as pool:
+        work = _QueryIngest(job_id, harvest_id, link_kinds, pool)
+        async with SruClient() as sru:
+
+            async def fetch() -> None:
+                async for page in sru.harvest(
+                    cql,
+                    max_records=max_records,
+                    page_size=settings.harvest_page_size,
+                    concurrency=settings.harvest_concurrency,
+                ):
+                    await pages.put(page)
+                await pages.put(_DONE)
+
+            failure: Exception | None = None
+            in_flight: set[asyncio.Task] = set()
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    tg.create_task(fetch())
+                    tg.create_task(_stage(pages, parsed, work.parse, in_flight))
+                    tg.create_task(_stage(parsed, stored, work.store, in_flight))
+                    tg.create_task(_stage(stored, None, work.enqueue, in_flight))
+            except ExceptionGroup as eg:
+                # A failing stage cancels the others. Log every error, then
+                # report the first one rather than the group.
+                errors = _stage_errors(eg)
+                for e in errors:
+                    logger.error("Query ingest %s: stage failed", job_id, exc_info=e)
+                failure = errors[0]
+            finally:
+                # A store call still running after cancellation may yet commit
+                # assets; wait for it, so the flush below sends them too.
+                for result in await asyncio.gather(*in_flight, return_exceptions=True):
+                    if isinstance(result, Exception):
+                        logger.error("Query ingest %s: cancelled stage call failed", job_id, exc_info=result)
+                # Stored assets must reach the queue, or the job never completes.
+                try:
+                    await asyncio.to_thread(work.flush)
+                except Exception as e:
+                    if failure is None:
+                        raise
+                    logger.error("Query ingest %s: sending the pending batches failed", job_id, exc_info=e)
+                    failure.add_note(f"Sending the pending batches failed too: {e!r}")
+            if failure is not None:
+                raise failure
+    return work.progress
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import delete, func, select
+
+from app.core.config import settings
+from app.db.bulk import dialect_insert
+from app.db.models import HostLease, HostThrottle
+from app.db.session import SessionLocal
+
+
+class HostBusy(Exception):
+    """The host has no budget right now; try again after ``retry_after`` seconds."""
+
+    def __init__(self, host: str, retry_after: float) -> None:
+        super().__init__(f"Host {host} is throttled; retry in {retry_after:.1f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+@dataclass
+class HostPermit:
+    host: str
+    lease_id: str
+
+
+def _jitter(delay: float) -> float:
+    # Spread re-queued tasks so they don't all come back in the same instant.
+    return delay + random.uniform(0, min(5.0, delay * 0.25 + 0.5))
+
+
+def acquire(host: str) -> HostPermit:
+    """Take one token and one in-flight slot for ``host``, or raise :class:`HostBusy`.
+
+    State lives in ``host_throttles``/``host_leases``. The throttle row is
+    locked for the length of this short transaction, so all worker processes
+    see one token bucket and one in-flight count per host.
+    """
+    now = time.time()
+    db = SessionLocal()
+    try:
+        db.execute(
+            dialect_insert(db)(HostThrottle)
+            .values(
+                host=host,
+                rate=settings.host_rate_per_second,
+                tokens=settings.host_burst,
+                refilled_at=now,
+            )
+            .on_conflict_do_nothing(index_elements=[HostThrottle.host])
+        )
+        throttle = db.execute(select(HostThrottle).where(HostThrottle.host == host).with_for_update()).scalar_one()
+
+        if throttle.blocked_until is not None and throttle.blocked_until > now:
+            raise HostBusy(host, _jitter(throttle.blocked_until - now))
+
+        db.execute(delete(HostLease).where(HostLease.host == host, HostLease.expires_at <= now))
+        in_flight = db.scalar(select(func.count()).select_from(HostLease).where(HostLease.host == host)) or 0
+        if in_flight >= settings.host_max_in_flight:
+            # A slot frees up when some download finishes; poll at roughly the token rate.
+            raise HostBusy(host, _jitter(max(1.0, 1.0 / throttle.rate)))
+
+        tokens = min(settings.host_burst, throttle.tokens + (now - throttle.refilled_at) * throttle.rate)
+        if tokens < 1.0:
+            throttle.tokens = tokens
+            throttle.refilled_at = now
+            db.commit()
+            raise HostBusy(host, _jitter((1.0 - tokens) / throttle.rate))
+
+        throttle.tokens = tokens - 1.0
+        throttle.refilled_at = now
+        lease = HostLease(host=host, expires_at=now + settings.host_lease_seconds)
+        db.add(lease)
+        db.flush()
+        permit = HostPermit(host=host, lease_id=lease.id)
+        db.commit()
+        return permit
+    except HostBusy:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def release(permit: HostPermit, *, throttled: bool = False, retry_after: float | None = None, ok: bool = False) -> None:
+    """Give back the in-flight slot and adapt the host's rate.
+
+    A throttling response (429/503) halves the rate and blocks the host for
+    ``retry_after`` seconds; a successful download raises the rate by
+    ``host_rate_increase`` (AIMD).
+    """
+    now = time.time()
+    db = SessionLocal()
+    try:
+        db.execute(delete(HostLease).where(HostLease.id == permit.lease_id))
+        throttle = db.execute(
+            select(HostThrottle).where(HostThrottle.host == permit.host).with_for_update()
+        ).scalar_one_or_none()
+        if throttle is not None:
+            if throttled:
+                throttle.rate = max(settings.host_min_rate_per_second, throttle.rate / 2)
+                delay = retry_after if retry_after is not None else settings.host_default_backoff_seconds
+                throttle.blocked_until = max(throttle.blocked_until or 0.0, now + delay)
+                throttle.tokens = 0.0
+                throttle.refilled_at = now
+            elif ok:
+                throttle.rate = min(settings.host_max_rate_per_second, throttle.rate + settings.host_rate_increase)
+        db.commit()
+    finally:
+        db.close()
@@ -1,15 +1,209 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import traceback
+from collections.abc import Callable
+from dataclasses import dataclass
+from urllib.parse import urlparse
 
 from celery import shared_task
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, joinedload
 
+from app.core.config import settings
+from app.core.profiling import profiled_task
 from app.db.session import SessionLocal
-from app.db.models import Asset, Job
-from app.ingest.downloader import download_to_minio
+from app.db.models import Asset, Harvest, Job, JobItem
+from app.db.progress import StatusChange, apply_status_changes, lock_assets
+from app.ingest.async_downloader import AsyncDownloadEngine, get_download_engine
+from app.ingest.blobs import (
+    BlobGone,
+    acquire_blob,
+    collect_garbage_blobs,
+    drop_blob_reference,
+    record_unreferenced_blob,
+)
+from app.ingest.downloader import DownloadResult, RateLimited, download_to_minio
+from app.ingest.storage import get_minio_client
+from app.worker import scheduler
+from app.worker.harvest import run_harvest
+from app.worker.query_ingest import run_query_ingest
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"done", "failed"}
+# Delay before downloading again an asset whose blob the garbage collector is removing.
+BLOB_GONE_RETRY_SECONDS = 10.0
+
+
+@dataclass
+class _Outcome:
+    status: str  # "done", "failed" or "deferred"
+    result: DownloadResult | None = None
+    error: str | None = None
+    retry_in: float | None = None
+
+
+def _storage_key(asset: Asset) -> str | None:
+    if settings.s3_content_addressed:
+        return None
+    return f"{asset.link.record_idn}/{asset.id}"
+
+
+def _download_asset(url: str, storage_key: str | None, on_start: Callable[[], None] | None = None) -> _Outcome:
+    """Download one asset under the per-host scheduler; never raises.
+
+    ``on_start`` runs once the host has granted a slot, right before the
+    transfer begins. If the scheduler's own database calls fail, the asset is
+    deferred (acquire) or the lease is left to expire (release).
+    """
+    try:
+        permit = scheduler.acquire(urlparse(url).hostname or "")
+    except scheduler.HostBusy as e:
+        return _Outcome("deferred", retry_in=e.retry_after)
+    except Exception:
+        logger.warning("Host scheduler unavailable for %s; deferring", url, exc_info=True)
+        return _Outcome("deferred", retry_in=settings.host_default_backoff_seconds)
+
+    ok = throttled = False
+    retry_after: float | None = None
+    try:
+        if on_start is not None:
+            on_start()
+        res = download_to_minio(url, storage_key)
+        ok = True
+        return _Outcome("done", result=res)
+    except RateLimited as e:
+        throttled, retry_after = True, e.retry_after
+        retry_in = settings.host_default_backoff_seconds if e.retry_after is None else e.retry_after
+        return _Outcome("deferred", retry_in=retry_in)
+    except Exception as e:
+        return _Outcome("failed", error=f"{e}\n{traceback.format_exc()}")
+    finally:
+        _release(permit, ok=ok, throttled=throttled, retry_after=retry_after)
+
+
+def _release(permit: scheduler.HostPermit, **kwargs) -> None:
+    """:func:`scheduler.release` that only logs a failure; the lease expires after ``host_lease_seconds``."""
+    try:
+        scheduler.release(permit, **kwargs)
+    except Exception:
+        logger.warning("Could not release host lease %s", permit.lease_id, exc_info=True)
+
+
+async def _download_asset_async(engine: AsyncDownloadEngine, url: str, storage_key: str | None) -> _Outcome:
+    """:func:`_download_asset` on the engine's loop; scheduler calls go to its thread pool."""
+    try:
+        permit = await asyncio.to_thread(scheduler.acquire, urlparse(url).hostname or "")
+    except scheduler.HostBusy as e:
+        return _Outcome("deferred", retry_in=e.retry_after)
+    except Exception:
+        logger.warning("Host scheduler unavailable for %s; deferring", url, exc_info=True)
+        return _Outcome("deferred", retry_in=settings.host_default_backoff_seconds)
+
+    ok = throttled = False
+    retry_after: float | None = None
+    try:
+        res = await engine.download(url, storage_key)
+        ok = True
+        return _Outcome("done", result=res)
+    except RateLimited as e:
+        throttled, retry_after = True, e.retry_after
+        retry_in = settings.host_default_backoff_seconds if e.retry_after is None else e.retry_after
+        return _Outcome("deferred", retry_in=retry_in)
+    except Exception as e:
+        return _Outcome("failed", error=f"{e}\n{traceback.format_exc()}")
+    finally:
+        await asyncio.to_thread(_release, permit, ok=ok, throttled=throttled, retry_after=retry_after)
+
+
+def _download_assets(assets: list[Asset]) -> list[_Outcome]:
+    jobs = [(a.link.url, _storage_key(a)) for a in assets]
+    if settings.ingest_mode != "async":
+        return [_download_asset(url, key) for url, key in jobs]
+
+    engine = get_download_engine()
+
+    async def download_all() -> list[_Outcome]:
+        return await asyncio.gather(*(_download_asset_async(engine, url, key) for url, key in jobs))
+
+    return engine.run(download_all())
+
+
+def _give_up_deferral(asset: Asset, outcome: _Outcome) -> _Outcome:
+    """Turn a deferral into a failure once the asset has been deferred ``host_max_deferrals`` times."""
+    if outcome.status == "deferred" and asset.deferrals >= settings.host_max_deferrals:
+        return _Outcome("failed", error=f"Host still busy or rate-limited after {asset.deferrals} deferrals")
+    return outcome
+
+
+def _take_blob(db: Session, asset: Asset, outcome: _Outcome) -> _Outcome:
+    """Reference the content-addressed blob of a finished download; download again if it is being collected."""
+    if outcome.status != "done" or not settings.s3_content_addressed:
+        return outcome
+    # ``asset`` is locked and fresh: an overlapping run of the same asset may
+    # already have pointed it at this blob, or at an older one.
+    previous = asset.blob_sha256
+    if previous == outcome.result.sha256:
+        return outcome
+    try:
+        acquire_blob(db, asset, outcome.result)
+    except BlobGone:
+        return _Outcome("deferred", retry_in=BLOB_GONE_RETRY_SECONDS)
+    if previous is not None:
+        drop_blob_reference(db, previous)
+    return outcome
+
+
+def _discard_download(db: Session, outcome: _Outcome) -> None:
+    """Clean up after a download whose asset was deleted meanwhile (no commit).
+
+    A content-addressed object is recorded as an unreferenced blob, which
+    ``gc_blobs`` removes after the grace period; an asset's own object is
+    removed right away.
+    """
+    if outcome.status != "done":
+        return
+    if settings.s3_content_addressed:
+        record_unreferenced_blob(db, outcome.result)
+    else:
+        get_minio_client().remove_object(settings.s3_bucket, outcome.result.storage_key)
+
+
+def _apply_outcome(db: Session, asset: Asset, outcome: _Outcome) -> tuple[dict, StatusChange]:
+    """Record ``outcome`` on ``asset`` (no commit); return the values written and the status change."""
+    if outcome.status == "done":
+        res = outcome.result
+        values = {
+            "status": "done",
+            "storage_key": res.storage_key,
+            "sha256": res.sha256,
+            "mime_type": res.mime_type,
+            "size_bytes": res.size_bytes,
+            "error": None,
+            "deferrals": 0,
+        }
+        if settings.s3_content_addressed:
+            values["blob_sha256"] = res.sha256
+    elif outcome.status == "failed":
+        values = {"status": "failed", "error": outcome.error, "deferrals": 0}
+    else:
+        values = {"status": "queued", "deferrals": asset.deferrals + 1}
+    change = StatusChange(asset.id, asset.status, values["status"], values.get("size_bytes"))
+    for k, v in values.items():
+        setattr(asset, k, v)
+    return values, change
+
+
+def _defer_asset(asset_id: str, delay: float) -> dict:
+    """Put the asset back on the queue instead of holding a worker slot while we wait."""
+    ingest_asset.apply_async(args=[asset_id], countdown=delay)
+    return {"status": "deferred", "asset_id": asset_id, "retry_in": round(delay, 1)}
 
 
 @shared_task(name="ingest_asset")
+@profiled_task
 def ingest_asset(asset_id: str) -> dict:
     db = SessionLocal()
     try:
@@ -21,28 +215,34 @@ def ingest_asset(asset_id: str) -> dict:
         if asset.status == "done":
             return {"status": "done", "asset_id": asset_id, "storage_key": asset.storage_key}
 
-        asset.status = "downloading"
-        asset.error = None
-        db.commit()
-
-        url = asset.link.url  # relationship
-        record_idn = asset.link.record_idn
-        storage_key = f"{record_idn}/{asset.id}"
-
-        res = download_to_minio(url, storage_key)
+        def mark_downloading() -> None:
+            db.refresh(asset, with_for_update=True)
+            apply_status_changes(db, [StatusChange(asset.id, asset.status, "downloading")])
+            asset.status = "downloading"
+            asset.error = None
+            db.commit()
 
-        asset.status = "done"
-        asset.storage_key = res.storage_key
-        asset.sha256 = res.sha256
-        asset.mime_type = res.mime_type
-        asset.size_bytes = res.size_bytes
+        outcome = _download_asset(asset.link.url, _storage_key(asset), on_start=mark_downloading)
+        if not lock_assets(db, [asset_id]):  # deleted while downloading
+            _discard_download(db, outcome)
+            db.commit()
+            return {"status": "missing", "asset_id": asset_id}
+        outcome = _give_up_deferral(asset, _take_blob(db, asset, outcome))
+        _, change = _apply_outcome(db, asset, outcome)
+        apply_status_changes(db, [change])
         db.commit()
 
-        return {"status": "done", "asset_id": asset_id, "storage_key": res.storage_key}
+        if outcome.status == "deferred":
+            return _defer_asset(asset_id, outcome.retry_in)
+        if outcome.status == "failed":
+            return {"status": "failed", "asset_id": asset_id, "error": outcome.error.splitlines()[0]}
+        return {"status": "done", "asset_id": asset_id, "storage_key": asset.storage_key}
 
     except Exception as e:
-        asset = db.get(Asset, asset_id)
+        db.rollback()
+        asset = db.get(Asset, asset_id, with_for_update=True)
         if asset is not None:
+            apply_status_changes(db, [StatusChange(asset.id, asset.status, "failed")])
             asset.status = "failed"
             asset.error = f"{e}\n{traceback.format_exc()}"
             db.commit()
@@ -51,29 +251,254 @@ def ingest_asset(asset_id: str) -> dict:
         db.close()
 
 
-@shared_task(name="finalize_job")
-def finalize_job(job_id: str) -> dict:
-    """Mark job completed if all assets are terminal (done/failed)."""
+@shared_task(name="ingest_asset_batch")
+@profiled_task
+def ingest_asset_batch(asset_ids: list[str]) -> dict:
+    """Download a group of assets with one DB session and one bulk status write.
+
+    With ``INGEST_MODE=async`` the batch's downloads run concurrently on this
+    process's :class:`~app.ingest.async_downloader.AsyncDownloadEngine`.
+
+    Assets whose host is throttled are handed back to the queue as single
+    ``ingest_asset`` tasks; ``finalize_job`` waits for them.
+    """
+    db = SessionLocal()
+    try:
+        assets = (
+            db.execute(
+                select(Asset)
+                .options(joinedload(Asset.link))
+                .where(Asset.id.in_(asset_ids), Asset.status != "done")
+                .with_for_update(of=Asset)
+            )
+            .scalars()
+            .all()
+        )
+        if not assets:
+            return {"status": "ok", "done": 0, "failed": 0, "deferred": 0}
+
+        apply_status_changes(db, [StatusChange(a.id, a.status, "downloading") for a in assets])
+        db.execute(
+            update(Asset)
+            .where(Asset.id.in_([a.id for a in assets]))
+            .values(status="downloading", error=None)
+        )
+        db.commit()
+
+        outcomes = _download_assets(assets)
+        # Statuses as they are now, not as loaded above: another worker may
+        # have moved an asset in the meantime.
+        existing = lock_assets(db, [a.id for a in assets])
+
+        rows: list[dict] = []
+        changes: list[StatusChange] = []
+        deferred: list[tuple[str, float]] = []
+        counts = {"done": 0, "failed": 0, "deferred": 0}
+        for asset, outcome in zip(assets, outcomes):
+            if asset.id not in existing:  # deleted while downloading
+                _discard_download(db, outcome)
+                continue
+            outcome = _give_up_deferral(asset, _take_blob(db, asset, outcome))
+            values, change = _apply_outcome(db, asset, outcome)
+            rows.append({"id": asset.id, **values})
+            changes.append(change)
+            counts[outcome.status] += 1
+            if outcome.status == "deferred":
+                deferred.append((asset.id, outcome.retry_in))
+
+        # One executemany UPDATE by primary key for the whole batch.
+        db.expunge_all()
+        db.execute(update(Asset), rows)
+        apply_status_changes(db, changes)
+        db.commit()
+
+        for asset_id, delay in deferred:
+            ingest_asset.apply_async(args=[asset_id], countdown=delay)
+        return {"status": "ok", **counts}
+    finally:
+        db.close()
+
+
+def _fail_unfinished(db: Session, asset_ids, error: str) -> int:
+    """Mark the assets of ``asset_ids`` that are not done or failed yet as failed (no commit)."""
+    assets = db.scalars(
+        select(Asset).where(Asset.id.in_(asset_ids), Asset.status.not_in(TERMINAL_STATUSES)).with_for_update()
+    ).all()
+    apply_status_changes(db, [StatusChange(a.id, a.status, "failed") for a in assets])
+    for asset in assets:
+        asset.status = "failed"
+        asset.error = error
+    return len(assets)
+
+
+@shared_task(name="fail_asset_batch")
+def fail_asset_batch(request, exc, traceback_, asset_ids: list[str]) -> None:
+    """``link_error`` of ``ingest_asset_batch``: a batch that raised fails its unfinished assets.
+
+    Otherwise they would stay ``downloading`` until ``finalize_job`` times out.
+    """
+    db = SessionLocal()
+    try:
+        _fail_unfinished(db, asset_ids, f"ingest_asset_batch {request.id} failed: {exc!r}")
+        db.commit()
+    finally:
+        db.close()
+
+
+@shared_task(name="finalize_job", bind=True, max_retries=None)
+def finalize_job(self, job_id: str) -> dict:
+    """Mark the job completed once its counters show no queued or downloading asset.
+
+    Enqueued after the job's batches; it checks again every
+    ``job_finalize_poll_seconds`` while batches or deferred assets are still
+    pending. After ``job_finalize_timeout_seconds`` it stops waiting: assets
+    that are still not done (e.g. claimed by a worker that was killed) are
+    marked failed and the job is completed.
+    """
     db = SessionLocal()
     try:
         job = db.get(Job, job_id)
         if job is None:
             return {"status": "missing", "job_id": job_id}
 
-        assets = [item.asset_id for item in job.items]
-        if not assets:
-            job.status = "completed"
-            db.commit()
-            return {"status": "completed", "job_id": job_id}
+        gave_up = 0
+        if job.queued or job.downloading:
+            waited = self.request.retries * settings.job_finalize_poll_seconds
+            if waited < settings.job_finalize_timeout_seconds:
+                raise self.retry(countdown=settings.job_finalize_poll_seconds)
+            gave_up = _fail_unfinished(
+                db,
+                select(JobItem.asset_id).where(JobItem.job_id == job_id),
+                f"Not finished when job {job_id} timed out after {waited}s",
+            )
 
-        # Fetch statuses
-        rows = db.query(Asset.status).filter(Asset.id.in_(assets)).all()
-        statuses = [s for (s,) in rows]
-        if all(s in {"done", "failed"} for s in statuses):
-            job.status = "completed"
+        # Conditional update: completion is recorded exactly once.
+        db.execute(update(Job).where(Job.id == job_id, Job.status != "completed").values(status="completed"))
+        db.commit()
+        return {"status": "completed", "job_id": job_id, "timed_out": gave_up}
+    finally:
+        db.close()
+
+
+@shared_task(name="gc_blobs")
+def gc_blobs() -> dict:
+    """Delete content-addressed blobs that have been unreferenced past the grace period."""
+    db = SessionLocal()
+    try:
+        removed = collect_garbage_blobs(db, get_minio_client())
+        return {"status": "ok", "removed": removed}
+    finally:
+        db.close()
+
+
+def _fail_harvest(harvest_id: str, error: str) -> None:
+    """Mark the harvest failed, unless it completed."""
+    db = SessionLocal()
+    try:
+        harvest = db.get(Harvest, harvest_id, with_for_update=True)
+        if harvest is not None and harvest.status != "completed":
+            harvest.status = "failed"
+            harvest.error = error
             db.commit()
-            return {"status": "completed", "job_id": job_id}
+    finally:
+        db.close()
+
 
-        return {"status": "running", "job_id": job_id}
+def _on_harvest_query_failure(task, exc, task_id, args, kwargs, einfo) -> None:
+    # Anything harvest_query did not handle itself, e.g. a database error.
+    _fail_harvest(args[0] if args else kwargs["harvest_id"], f"{exc}\n{einfo}")
+
+
+@shared_task(name="harvest_query", on_failure=_on_harvest_query_failure)
+def harvest_query(harvest_id: str) -> dict:
+    """Harvest every record matching the harvest's CQL query into the database."""
+    db = SessionLocal()
+    try:
+        harvest = db.get(Harvest, harvest_id)
+        if harvest is None:
+            return {"status": "missing", "harvest_id": harvest_id}
+
+        harvest.status = "running"
+        harvest.error = None
+        db.commit()
+
+        try:
+            progress = asyncio.run(run_harvest(harvest.id, harvest.cql, harvest.max_records))
+        except Exception as e:
+            db.rollback()
+            _fail_harvest(harvest_id, f"{e}\n{traceback.format_exc()}")
+            return {"status": "failed", "harvest_id": harvest_id, "error": str(e)}
+
+        db.refresh(harvest)
+        harvest.status = "completed"
+        db.commit()
+        return {
+            "status": "completed",
+            "harvest_id": harvest_id,
+            "records": progress.harvested,
+            "failed": progress.failed,
+        }
+    finally:
+        db.close()
+
+
+def _fail_query_ingest(job_id: str, error: str) -> None:
+    """Mark the job's harvest failed (unless it completed) and let ``finalize_job`` complete the job."""
+    db = SessionLocal()
+    try:
+        harvest_id = db.scalar(select(Job.harvest_id).where(Job.id == job_id))
+    finally:
+        db.close()
+    if harvest_id is not None:
+        _fail_harvest(harvest_id, error)
+    finalize_job.delay(job_id)
+
+
+def _on_ingest_query_failure(task, exc, task_id, args, kwargs, einfo) -> None:
+    # Anything ingest_query did not handle itself, e.g. a database error.
+    _fail_query_ingest(args[0] if args else kwargs["job_id"], f"{exc}\n{einfo}")
+
+
+@shared_task(name="ingest_query", on_failure=_on_ingest_query_failure)
+def ingest_query(job_id: str, link_kinds: list[str]) -> dict:
+    """Harvest the job's CQL query and ingest the links of the wanted kinds as one job.
+
+    Downloads are enqueued while the harvest runs (see
+    :func:`~app.worker.query_ingest.run_query_ingest`); ``finalize_job``
+    completes the job afterwards, also when the harvest failed part-way or
+    the task itself raised.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        harvest = job.harvest if job is not None else None
+        if harvest is None:
+            return {"status": "missing", "job_id": job_id}
+
+        harvest.status = "running"
+        harvest.error = None
+        db.commit()
+
+        try:
+            progress = asyncio.run(
+                run_query_ingest(job_id, harvest.id, harvest.cql, harvest.max_records, link_kinds)
+            )
+        except Exception as e:
+            db.rollback()
+            _fail_query_ingest(job_id, f"{e}\n{traceback.format_exc()}")
+            return {"status": "failed", "job_id": job_id, "error": str(e)}
+
+        db.refresh(harvest)
+        harvest.status = "completed"
+        db.commit()
+        finalize_job.delay(job_id)
+        return {
+            "status": "completed",
+            "job_id": job_id,
+            "records": progress.harvested,
+            "failed": progress.failed,
+            "assets": progress.assets,
+            "batches": progress.batches,
+        }
     finally:
         db.close()
@@ -0,0 +1,139 @@
+"""Records/sec for MARC parsing of SRU pages: XPath-per-field vs. single pass.
+
+``legacy`` is the former path: serialize each ``<record>`` out of the SRU
+document, re-parse it and run one ``.//`` XPath scan per field. ``single-pass``
+walks the already-parsed element once; ``+raw`` adds the MARCXML
+serialization that persistence needs.
+
+    python -m benchmarks.bench_marc_parse [--records 5000] [--page-size 100] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from lxml import etree
+
+from app.dnb.marc import MARC_NS, ParsedLink, _text, _year_re, parse_marc_element
+from app.dnb.sru_client import SRU_NS
+from benchmarks.corpus import make_corpus, make_sru_response
+
+
+def legacy_parse_marcxml_record(marcxml: str) -> tuple:
+    root = etree.fromstring(marcxml.encode("utf-8"))
+
+    idn = root.findtext(".//m:controlfield[@tag='001']", namespaces=MARC_NS)
+    if not idn:
+        raise ValueError("MARCXML record missing controlfield 001")
+
+    title_a = root.findtext(".//m:datafield[@tag='245']/m:subfield[@code='a']", namespaces=MARC_NS)
+    title_b = root.findtext(".//m:datafield[@tag='245']/m:subfield[@code='b']", namespaces=MARC_NS)
+    title = " ".join([t.strip(" /:") for t in [title_a or "", title_b or ""] if t.strip()]).strip() or None
+
+    c_264 = root.findtext(".//m:datafield[@tag='264']/m:subfield[@code='c']", namespaces=MARC_NS)
+    c_260 = root.findtext(".//m:datafield[@tag='260']/m:subfield[@code='c']", namespaces=MARC_NS)
+    year = None
+    for candidate in [c_264, c_260]:
+        if not candidate:
+            continue
+        m = _year_re.search(candidate)
+        if m:
+            year = int(m.group(1))
+            break
+
+    creators: list[str] = []
+    for path in [
+        ".//m:datafield[@tag='100']/m:subfield[@code='a']",
+        ".//m:datafield[@tag='700']/m:subfield[@code='a']",
+    ]:
+        for el in root.findall(path, namespaces=MARC_NS):
+            t = _text(el)
+            if t and t not in creators:
+                creators.append(t)
+
+    links: list[ParsedLink] = []
+    for fld in root.findall(".//m:datafield[@tag='856']", namespaces=MARC_NS):
+        url_els = fld.findall("./m:subfield[@code='u']", namespaces=MARC_NS)
+        description = _text(fld.find("./m:subfield[@code='3']", namespaces=MARC_NS))
+        label = _text(fld.find("./m:subfield[@code='y']", namespaces=MARC_NS))
+        for uel in url_els:
+            url = (_text(uel) or "").strip()
+            if not url:
+                continue
+            kind = "external"
+            marker = (description or "") + " " + (label or "")
+            if "inhaltsverzeichnis" in marker.lower():
+                kind = "toc"
+            elif "d-nb.info" in url:
+                kind = "dnb"
+            links.append(ParsedLink(url=url, label=label, description=description, kind=kind))
+
+    return (idn, title, year, creators, links, marcxml)
+
+
+def _record_elements(body: bytes) -> list[etree._Element]:
+    root = etree.fromstring(body)
+    return [rd[0] for rd in root.iterfind(".//srw:records/srw:record/srw:recordData", namespaces=SRU_NS) if len(rd)]
+
+
+def run_legacy(pages: list[bytes]) -> int:
+    n = 0
+    for body in pages:
+        for el in _record_elements(body):
+            legacy_parse_marcxml_record(etree.tostring(el, encoding="unicode"))
+            n += 1
+    return n
+
+
+def run_single_pass(pages: list[bytes]) -> int:
+    n = 0
+    for body in pages:
+        for el in _record_elements(body):
+            parse_marc_element(el)
+            n += 1
+    return n
+
+
+def run_single_pass_raw(pages: list[bytes]) -> int:
+    n = 0
+    for body in pages:
+        for el in _record_elements(body):
+            parse_marc_element(el).raw_marcxml
+            n += 1
+    return n
+
+
+def check_equivalent(pages: list[bytes]) -> None:
+    for body in pages:
+        for el in _record_elements(body):
+            raw = etree.tostring(el, encoding="unicode")
+            old = legacy_parse_marcxml_record(raw)
+            new = parse_marc_element(el)
+            assert old == (new.idn, new.title, new.year, new.creators, new.links, new.raw_marcxml), new.idn
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--records", type=int, default=5000)
+    ap.add_argument("--page-size", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    corpus = make_corpus(args.records)
+    pages = [
+        make_sru_response(corpus[i : i + args.page_size], number_of_records=len(corpus), start_record=i + 1)
+        for i in range(0, len(corpus), args.page_size)
+    ]
+    check_equivalent(pages)
+
+    for name, fn in [("legacy", run_legacy), ("single-pass", run_single_pass), ("single-pass+raw", run_single_pass_raw)]:
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            n = fn(pages)
+            best = min(best, time.perf_counter() - t0)
+        print(f"{name:<16} {n / best:10.0f} records/s  ({best * 1000:.1f} ms for {n} records, best of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
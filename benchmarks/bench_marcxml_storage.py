@@ -0,0 +1,141 @@
+"""Storage size and fetch latency of raw MARCXML: inline ``Text`` vs compressed side table.
+
+"inline" is the former layout (``records.raw_marcxml`` loaded with every
+``Record``); "compressed" is ``record_sources`` with the codec from
+``MARCXML_CODEC``, loaded only when ``Record.raw_marcxml`` is read.
+
+    python -m benchmarks.bench_marcxml_storage [--dsn URL] [--records 5000] [--lookups 2000]
+
+On Postgres, sizes include TOAST (which already pglz-compresses long text).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, Integer, String, Text, create_engine, func, select, text
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, joinedload, mapped_column
+
+from app.db.base import Base
+from app.db.compression import compress_text
+from app.db.models import Record, RecordSource
+from app.dnb.marc import parse_marcxml_record
+from benchmarks.corpus import make_corpus
+
+
+class _LegacyBase(DeclarativeBase):
+    pass
+
+
+class LegacyRecord(_LegacyBase):
+    __tablename__ = "legacy_records"
+
+    idn: Mapped[str] = mapped_column(String(64), primary_key=True)
+    title: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    year: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    creators: Mapped[list[str] | None] = mapped_column(JSON, nullable=True)
+    raw_marcxml: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+def _size_bytes(db: Session, tables: list[str]) -> int:
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("ANALYZE"))
+        return sum(db.scalar(text("SELECT pg_total_relation_size(:t)"), {"t": t}) for t in tables)
+    # SQLite: pages owned by the tables and their indexes (needs the dbstat table).
+    names = ", ".join(f"'{t}'" for t in tables)
+    return db.scalar(
+        text(
+            "SELECT sum(pgsize) FROM dbstat WHERE name IN "
+            f"(SELECT name FROM sqlite_master WHERE tbl_name IN ({names}))"
+        )
+    )
+
+
+def _time_lookups(db: Session, idns: list[str], fetch) -> float:
+    t0 = time.perf_counter()
+    for idn in idns:
+        fetch(db, idn)
+        db.expunge_all()
+    return (time.perf_counter() - t0) / len(idns) * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--dsn", default=None, help="SQLAlchemy URL (default: temporary SQLite file)")
+    ap.add_argument("--records", type=int, default=5000)
+    ap.add_argument("--lookups", type=int, default=2000)
+    args = ap.parse_args()
+
+    tmpdir = None
+    dsn = args.dsn
+    if dsn is None:
+        tmpdir = tempfile.mkdtemp()
+        dsn = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    engine = create_engine(dsn)
+    for base in (Base, _LegacyBase):
+        base.metadata.drop_all(engine)
+        base.metadata.create_all(engine)
+
+    parsed = [parse_marcxml_record(x) for x in make_corpus(args.records)]
+    with Session(engine) as db:
+        db.execute(
+            LegacyRecord.__table__.insert(),
+            [
+                {"idn": p.idn, "title": p.title, "year": p.year, "creators": p.creators, "raw_marcxml": p.raw_marcxml}
+                for p in parsed
+            ],
+        )
+        db.execute(
+            Record.__table__.insert(),
+            [{"idn": p.idn, "title": p.title, "year": p.year, "creators": p.creators} for p in parsed],
+        )
+        t0 = time.perf_counter()
+        sources = []
+        for p in parsed:
+            codec, data = compress_text(p.raw_marcxml)
+            sources.append({"idn": p.idn, "codec": codec, "data": data, "raw_size": len(p.raw_marcxml)})
+        compress_us = (time.perf_counter() - t0) / len(parsed) * 1e6
+        db.execute(RecordSource.__table__.insert(), sources)
+        db.commit()
+
+        raw_chars = db.scalar(select(func.sum(RecordSource.raw_size)))
+        codec = sources[0]["codec"]
+        print(f"{len(parsed)} records, {raw_chars / len(parsed):.0f} chars of MARCXML each, codec {codec}")
+        print(f"compress   {compress_us:8.1f} us/record")
+
+        legacy_size = _size_bytes(db, ["legacy_records"])
+        new_records = _size_bytes(db, ["records"])
+        new_sources = _size_bytes(db, ["record_sources"])
+        print(f"inline     {legacy_size / 1024:10.0f} KiB")
+        print(f"compressed {(new_records + new_sources) / 1024:10.0f} KiB  (records {new_records / 1024:.0f}, sources {new_sources / 1024:.0f})")
+
+        rnd = random.Random(7)
+        idns = [rnd.choice(parsed).idn for _ in range(args.lookups)]
+        cases = [
+            ("inline", "metadata", lambda s, i: s.get(LegacyRecord, i).title),
+            ("compressed", "metadata", lambda s, i: s.get(Record, i).title),
+            ("inline", "raw", lambda s, i: s.get(LegacyRecord, i).raw_marcxml),
+            ("compressed", "raw", lambda s, i: s.get(Record, i).raw_marcxml),
+            ("compressed", "raw+join", lambda s, i: s.get(Record, i, options=[joinedload(Record.source)]).raw_marcxml),
+        ]
+        for layout, what, fetch in cases:
+            _time_lookups(db, idns[:100], fetch)  # warm up
+            best = min(_time_lookups(db, idns, fetch) for _ in range(3))
+            print(f"{layout:<10} {what:<8} {best:8.1f} us/lookup")
+
+    for base in (Base, _LegacyBase):
+        base.metadata.drop_all(engine)
+    engine.dispose()
+    if tmpdir is not None:
+        os.remove(os.path.join(tmpdir, "bench.db"))
+        os.rmdir(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Round-trips and wall time per page for the /search persistence step.
+
+Compares the former per-row ORM upsert (``db.get`` + ``flush`` per record and
+one ``SELECT`` per 856 link) with :func:`app.db.bulk.upsert_parsed_records`.
+
+    python -m benchmarks.bench_search_persist [--dsn URL] [--page-size 100] [--pages 5]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.db.bulk import upsert_parsed_records
+from app.db.models import Link, Record
+from app.dnb.marc import ParsedRecord, parse_marcxml_record
+from benchmarks.corpus import make_corpus
+
+
+def legacy_persist(db: Session, parsed_records: list[ParsedRecord]) -> None:
+    for parsed in parsed_records:
+        rec = db.get(Record, parsed.idn)
+        if rec is None:
+            rec = Record(idn=parsed.idn, title=parsed.title, year=parsed.year, raw_marcxml=parsed.raw_marcxml)
+            db.add(rec)
+        else:
+            rec.title = parsed.title
+            rec.year = parsed.year
+            rec.raw_marcxml = parsed.raw_marcxml
+        db.flush()
+
+        for l in parsed.links:
+            existing = (
+                db.query(Link)
+                .filter(Link.record_idn == parsed.idn)
+                .filter(Link.url == l.url)
+                .one_or_none()
+            )
+            if existing is None:
+                db.add(Link(record_idn=parsed.idn, url=l.url, label=l.label, description=l.description, kind=l.kind))
+            else:
+                existing.label = l.label
+                existing.description = l.description
+                existing.kind = l.kind
+
+
+def _make_engine(dsn: str | None):
+    if dsn:
+        return create_engine(dsn)
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+def run(name: str, persist, dsn: str | None, pages: list[list[ParsedRecord]]) -> None:
+    engine = _make_engine(dsn)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    statements = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_args, **_kwargs):
+        nonlocal statements
+        statements += 1
+
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+    # Each page is persisted twice: first as fresh inserts, then as updates.
+    for phase in ("insert", "update"):
+        statements = 0
+        t0 = time.perf_counter()
+        for page in pages:
+            with SessionLocal() as db:
+                persist(db, page)
+                db.commit()
+        elapsed = time.perf_counter() - t0
+        n_pages = len(pages)
+        print(
+            f"{name:<8} {phase:<7} {statements / n_pages:8.1f} round-trips/page"
+            f" {elapsed / n_pages * 1000:9.2f} ms/page"
+        )
+
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--dsn", default=None, help="SQLAlchemy URL (default: in-memory SQLite)")
+    ap.add_argument("--page-size", type=int, default=100)
+    ap.add_argument("--pages", type=int, default=5)
+    args = ap.parse_args()
+
+    corpus = make_corpus(args.page_size * args.pages)
+    parsed = [parse_marcxml_record(x) for x in corpus]
+    pages = [parsed[i : i + args.page_size] for i in range(0, len(parsed), args.page_size)]
+    n_links = sum(len(p.links) for p in parsed)
+    print(f"{len(pages)} pages x {args.page_size} records, {n_links / len(pages):.1f} links/page")
+
+    run("legacy", legacy_persist, args.dsn, pages)
+    run("bulk", upsert_parsed_records, args.dsn, pages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import random
+from xml.sax.saxutils import escape
+
+MARC_NS = "http://www.loc.gov/MARC21/slim"
+
+_WORDS = (
+    "mittelalter geschichte kirche stadt recht handel kloster urkunden chronik "
+    "kaiser reich sprache dichtung quellen studien beiträge land adel bürger"
+).split()
+_NAMES = ["Müller, Hans", "Schmidt, Anna", "Weber, Karl", "Fischer, Eva", "Wagner, Otto", "Becker, Lena"]
+_HOSTS = ["d-nb.info", "www.digizeitschriften.de", "books.example.org", "repo.example-uni.de"]
+
+
+def _subfields(pairs: list[tuple[str, str]]) -> str:
+    return "".join(f'<subfield code="{c}">{escape(v)}</subfield>' for c, v in pairs)
+
+
+def _datafield(tag: str, pairs: list[tuple[str, str]], ind1: str = " ", ind2: str = " ") -> str:
+    return f'<datafield tag="{tag}" ind1="{ind1}" ind2="{ind2}">{_subfields(pairs)}</datafield>'
+
+
+def make_marcxml_record(idn: str, rnd: random.Random, *, n_links: int | None = None) -> str:
+    """Build one MARC21-xml ``<record>`` shaped like a DNB catalogue record."""
+    title = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(2, 6))).capitalize()
+    subtitle = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(0, 5)))
+    year = rnd.randint(1550, 2024)
+
+    fields = [
+        f'<leader>00000nam a2200000 c 4500</leader>',
+        f'<controlfield tag="001">{idn}</controlfield>',
+        '<controlfield tag="003">DE-101</controlfield>',
+        f'<controlfield tag="008">{year % 100:02d}0101s{year}    gw |||||o||||||||||ger  </controlfield>',
+        _datafield("016", [("a", idn), ("2", "DE-101")], "7"),
+        _datafield("035", [("a", f"(DE-599)DNB{idn}")]),
+        _datafield("040", [("a", "1245"), ("b", "ger"), ("c", "DE-101"), ("d", "9999"), ("e", "rda")]),
+        _datafield("041", [("a", "ger")]),
+        _datafield("100", [("0", "(DE-588)1" + idn[-8:]), ("a", rnd.choice(_NAMES)), ("4", "aut")], "1"),
+        _datafield("245", [("a", title + (" :" if subtitle else ""))] + ([("b", subtitle)] if subtitle else []), "1", "0"),
+        _datafield(
+            "264" if year > 1990 else "260",
+            [("a", "Leipzig"), ("b", "Verlag"), ("c", f"[{year}]")],
+            " ",
+            "1",
+        ),
+        _datafield("300", [("a", f"{rnd.randint(40, 900)} Seiten")]),
+        _datafield("650", [("a", rnd.choice(_WORDS).capitalize())], " ", "7"),
+    ]
+    for _ in range(rnd.randint(0, 3)):
+        fields.append(_datafield("700", [("a", rnd.choice(_NAMES)), ("4", "edt")], "1"))
+
+    if n_links is None:
+        n_links = rnd.randint(1, 5)
+    for i in range(n_links):
+        if i == 0:
+            fields.append(
+                _datafield(
+                    "856",
+                    [("m", "B:DE-101"), ("q", "application/pdf"), ("u", f"https://d-nb.info/{idn}/04"), ("3", "Inhaltsverzeichnis")],
+                    "4",
+                    "2",
+                )
+            )
+        else:
+            host = rnd.choice(_HOSTS)
+            fields.append(
+                _datafield(
+                    "856",
+                    [("u", f"https://{host}/{idn}/{i}"), ("y", "Volltext"), ("x", "Langzeitarchivierung")],
+                    "4",
+                    "0",
+                )
+            )
+
+    return f'<record xmlns="{MARC_NS}" type="Bibliographic">{"".join(fields)}</record>'
+
+
+def make_corpus(n: int, *, seed: int = 42, start_idn: int = 1_000_000_000) -> list[str]:
+    rnd = random.Random(seed)
+    return [make_marcxml_record(str(start_idn + i), rnd) for i in range(n)]
+
+
+def make_sru_response(records: list[str], *, number_of_records: int, start_record: int = 1) -> bytes:
+    """Wrap MARCXML records in an SRU 1.1 ``searchRetrieveResponse`` body."""
+    items = "".join(
+        "<record><recordSchema>MARC21-xml</recordSchema><recordPacking>xml</recordPacking>"
+        f"<recordData>{r}</recordData><recordPosition>{start_record + i}</recordPosition></record>"
+        for i, r in enumerate(records)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<searchRetrieveResponse xmlns="http://www.loc.gov/zing/srw/">'
+        f"<version>1.1</version><numberOfRecords>{number_of_records}</numberOfRecords>"
+        f"<records>{items}</records></searchRetrieveResponse>"
+    ).encode("utf-8")
@@ -0,0 +1,369 @@
+"""Local stand-ins for the services the app talks to, for benchmarks.
+
+Each server runs a ``ThreadingHTTPServer`` (HTTP/1.1, keep-alive) on an
+ephemeral loopback port in a daemon thread; use them as context managers.
+
+- :class:`MockSruServer`: DNB SRU ``searchRetrieve`` over a synthetic corpus.
+- :class:`OriginServer`: asset origins with large, chunked, slow or
+  rate-limited bodies.
+- :class:`S3StandIn`: the subset of the S3 API the MinIO client uses for
+  uploads (buckets, single PUT, multipart, HEAD). Objects keep only their
+  size and SHA-256, so large bodies don't accumulate in memory.
+"""
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+from benchmarks.corpus import make_marcxml_record, make_sru_response
+
+_CHUNK = 64 * 1024
+
+
+def body_chunk(offset: int, size: int) -> bytes:
+    """Deterministic filler bytes; ``offset`` keeps chunks of one body distinct."""
+    block = hashlib.sha256(str(offset).encode()).digest() * (_CHUNK // 32)
+    return block[:size]
+
+
+def body_sha256(size: int) -> str:
+    """SHA-256 of the body :class:`OriginServer` sends for ``size`` bytes."""
+    h = hashlib.sha256()
+    for offset in range(0, size, _CHUNK):
+        h.update(body_chunk(offset, min(_CHUNK, size - offset)))
+    return h.hexdigest()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _Server
+
+    def log_message(self, format: str, *args) -> None:  # keep benchmark output clean
+        pass
+
+    def _send(self, status: int, body: bytes = b"", headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _dispatch(self) -> None:
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        self.server.owner.handle(self, url.path, query)
+
+    do_GET = do_HEAD = do_PUT = do_POST = do_DELETE = _dispatch
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    owner: _LocalServer
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients closing pooled keep-alive connections is routine here.
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class _LocalServer:
+    def __init__(self) -> None:
+        self._httpd: _Server | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def port(self) -> int:
+        assert self._httpd is not None, "server not started"
+        return self._httpd.server_address[1]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> None:
+        self._httpd = _Server(("127.0.0.1", 0), _Handler)
+        self._httpd.owner = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def handle(self, h: _Handler, path: str, query: dict[str, str]) -> None:
+        raise NotImplementedError
+
+
+class MockSruServer(_LocalServer):
+    """SRU endpoint over ``number_of_records`` synthetic MARC records.
+
+    The record at each position is generated from ``seed`` and the position
+    only, so any page is reproducible regardless of which pages were served
+    before. Bodies are built once per ``(startRecord, maximumRecords)``;
+    ``latency`` adds a fixed delay before every response.
+    """
+
+    def __init__(self, number_of_records: int, *, seed: int = 42, latency: float = 0.0) -> None:
+        super().__init__()
+        self.number_of_records = number_of_records
+        self.seed = seed
+        self.latency = latency
+        self.requests = 0
+        self._pages: dict[tuple[int, int], bytes] = {}
+        self._lock = threading.Lock()
+
+    def record(self, position: int) -> str:
+        return make_marcxml_record(str(1_000_000_000 + position), random.Random(self.seed * 1_000_003 + position))
+
+    def page(self, start_record: int, maximum_records: int) -> bytes:
+        key = (start_record, maximum_records)
+        with self._lock:
+            body = self._pages.get(key)
+        if body is None:
+            end = min(self.number_of_records, start_record + maximum_records - 1)
+            records = [self.record(p) for p in range(start_record, end + 1)]
+            body = make_sru_response(records, number_of_records=self.number_of_records, start_record=start_record)
+            with self._lock:
+                self._pages[key] = body
+        return body
+
+    def handle(self, h: _Handler, path: str, query: dict[str, str]) -> None:
+        self.requests += 1
+        if query.get("operation") != "searchRetrieve":
+            h._send(400, b"unsupported operation")
+            return
+        body = self.page(int(query.get("startRecord", 1)), int(query.get("maximumRecords", 10)))
+        if self.latency:
+            time.sleep(self.latency)
+        h._send(200, body, {"Content-Type": "text/xml; charset=utf-8"})
+
+
+class OriginServer(_LocalServer):
+    """Asset origin. Bodies are :func:`body_chunk` sequences; routes:
+
+    - ``/bytes/<n>``: ``n`` bytes with ``Content-Length``
+    - ``/chunked/<n>``: ``n`` bytes, chunked transfer encoding (length unknown)
+    - ``/slow/<n>?rate=<bytes per second>``: like ``/bytes``, paced
+    - ``/limited?retry_after=<seconds>``: ``429 Too Many Requests``
+
+    Any route takes ``?delay=<seconds>`` before the response headers.
+    ``/bytes`` and ``/slow`` send an ``ETag`` and answer ``Range: bytes=<n>-``
+    (with a matching or absent ``If-Range``) with ``206``, unless
+    ``?ranges=0``. ``?cut=<n>`` drops the connection after ``n`` body bytes
+    of every response. :attr:`bytes_sent` counts body bytes written.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.requests = 0
+        self.bytes_sent = 0
+
+    def handle(self, h: _Handler, path: str, query: dict[str, str]) -> None:
+        self.requests += 1
+        if "delay" in query:
+            time.sleep(float(query["delay"]))
+        route, _, arg = path.strip("/").partition("/")
+        if route == "limited":
+            h._send(429, b"slow down", {"Retry-After": query.get("retry_after", "30")})
+            return
+        if route not in {"bytes", "chunked", "slow"} or not arg.isdigit():
+            h._send(404, b"not found")
+            return
+
+        size = int(arg)
+        ranges = route != "chunked" and query.get("ranges") != "0"
+        etag = f'"{size}"'  # a body depends on its size only
+        start = 0
+        m = re.fullmatch(r"bytes=(\d+)-", h.headers.get("Range", ""))
+        if ranges and m and h.headers.get("If-Range", etag) == etag:
+            start = int(m.group(1))
+            if start >= size:
+                h._send(416, headers={"Content-Range": f"bytes */{size}"})
+                return
+
+        h.send_response(206 if start else 200)
+        h.send_header("Content-Type", "application/pdf")
+        if route == "chunked":
+            h.send_header("Transfer-Encoding", "chunked")
+        else:
+            h.send_header("Content-Length", str(size - start))
+        if ranges:
+            h.send_header("ETag", etag)
+            h.send_header("Accept-Ranges", "bytes")
+        if start:
+            h.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        h.end_headers()
+        if h.command == "HEAD":
+            return
+
+        rate = float(query.get("rate", 0)) if route == "slow" else 0.0
+        cut = int(query["cut"]) if "cut" in query else None
+        started = time.perf_counter()
+        sent = 0
+        for offset in range(start - start % _CHUNK, size, _CHUNK):
+            chunk = body_chunk(offset, min(_CHUNK, size - offset))[max(0, start - offset) :]
+            if cut is not None and sent + len(chunk) > cut:
+                chunk = chunk[: cut - sent]
+                h.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk) if route == "chunked" else chunk)
+                self.bytes_sent += len(chunk)
+                h.close_connection = True
+                return
+            if rate:
+                ahead = (sent + len(chunk)) / rate - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+            sent += len(chunk)
+            self.bytes_sent += len(chunk)
+            if route == "chunked":
+                h.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            else:
+                h.wfile.write(chunk)
+        if route == "chunked":
+            h.wfile.write(b"0\r\n\r\n")
+
+
+@dataclass
+class StoredObject:
+    size: int
+    sha256: str
+    content_type: str | None
+    etag: str
+
+
+class S3StandIn(_LocalServer):
+    """Just enough S3 for ``Minio.put_object``/``fput_object``/``stat_object``.
+
+    Requests are not authenticated. Point the app at it with
+    ``S3_ENDPOINT=127.0.0.1:<port>``, ``S3_SECURE=false`` and ``S3_REGION``
+    set, so the client never asks for the bucket location.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.buckets: set[str] = set()
+        self.objects: dict[tuple[str, str], StoredObject] = {}
+        self.bytes_received = 0
+        self._uploads: dict[str, dict[int, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def _store(self, bucket: str, key: str, data: bytes, content_type: str | None) -> StoredObject:
+        obj = StoredObject(
+            size=len(data),
+            sha256=hashlib.sha256(data).hexdigest(),
+            content_type=content_type,
+            etag=hashlib.md5(data).hexdigest(),
+        )
+        with self._lock:
+            self.objects[(bucket, key)] = obj
+        return obj
+
+    @staticmethod
+    def _error(h: _Handler, status: int, code: str) -> None:
+        body = f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><Error><Code>{code}</Code><Message>{code}</Message></Error>"
+        h._send(status, body.encode(), {"Content-Type": "application/xml"})
+
+    def handle(self, h: _Handler, path: str, query: dict[str, str]) -> None:
+        bucket, _, key = path.lstrip("/").partition("/")
+        method = h.command
+        body = self._read_body_of(h)
+
+        if not key:
+            if method == "HEAD":
+                h._send(200 if bucket in self.buckets else 404)
+            elif method == "PUT":
+                self.buckets.add(bucket)
+                h._send(200)
+            elif method == "GET" and "location" in query:
+                h._send(200, b'<?xml version="1.0" encoding="UTF-8"?><LocationConstraint/>', {"Content-Type": "application/xml"})
+            else:
+                self._error(h, 501, "NotImplemented")
+            return
+        if bucket not in self.buckets:
+            self._error(h, 404, "NoSuchBucket")
+            return
+
+        if method == "POST" and "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            with self._lock:
+                self._uploads[upload_id] = {}
+            xml = (
+                "<InitiateMultipartUploadResult>"
+                f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>"
+                "</InitiateMultipartUploadResult>"
+            )
+            h._send(200, xml.encode(), {"Content-Type": "application/xml"})
+        elif method == "PUT" and "uploadId" in query:
+            with self._lock:
+                parts = self._uploads.get(query["uploadId"])
+                if parts is not None:
+                    parts[int(query["partNumber"])] = body
+            if parts is None:
+                self._error(h, 404, "NoSuchUpload")
+                return
+            h._send(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+        elif method == "POST" and "uploadId" in query:
+            with self._lock:
+                parts = self._uploads.pop(query["uploadId"], None)
+            if parts is None:
+                self._error(h, 404, "NoSuchUpload")
+                return
+            obj = self._store(bucket, key, b"".join(parts[n] for n in sorted(parts)), None)
+            xml = (
+                "<CompleteMultipartUploadResult>"
+                f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><ETag>\"{obj.etag}\"</ETag>"
+                "</CompleteMultipartUploadResult>"
+            )
+            h._send(200, xml.encode(), {"Content-Type": "application/xml"})
+        elif method == "DELETE" and "uploadId" in query:
+            with self._lock:
+                self._uploads.pop(query["uploadId"], None)
+            h._send(204)
+        elif method == "PUT":
+            obj = self._store(bucket, key, body, h.headers.get("Content-Type"))
+            h._send(200, headers={"ETag": f'"{obj.etag}"'})
+        elif method == "HEAD":
+            obj = self.objects.get((bucket, key))
+            if obj is None:
+                h._send(404)
+                return
+            h.send_response(200)
+            h.send_header("Content-Length", str(obj.size))
+            h.send_header("ETag", f'"{obj.etag}"')
+            h.send_header("Content-Type", obj.content_type or "application/octet-stream")
+            h.send_header("Last-Modified", "Thu, 01 Jan 2026 00:00:00 GMT")
+            h.end_headers()
+        elif method == "DELETE":
+            with self._lock:
+                self.objects.pop((bucket, key), None)
+            h._send(204)
+        else:
+            self._error(h, 501, "NotImplemented")
+
+    def _read_body_of(self, h: _Handler) -> bytes:
+        body = h._read_body()
+        with self._lock:
+            self.bytes_received += len(body)
+        return body
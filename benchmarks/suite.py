@@ -0,0 +1,414 @@
+"""Benchmark suite: MARC parsing, /search persistence and asset downloads.
+
+Everything runs against local stand-ins (see :mod:`benchmarks.servers`): a
+mock SRU server, an origin server and an in-process S3, so numbers depend
+on the code and the machine, not on the network or on DNB.
+
+    python -m benchmarks.suite [--only parse,search,download] [--quick] [--dsn URL]
+                               [--out FILE] [--compare BASELINE.json]
+
+Results are written as JSON tagged with the git commit (default
+``benchmarks/results/<commit>[-dirty].json``). ``--compare`` prints the
+change of every timing metric against an earlier run of the same
+parameters. ``--dsn`` drops and recreates all tables of that database.
+
+Metric names end in ``_per_sec`` (higher is better) or ``_ms``/``_us``
+(lower is better). Latencies are per operation; ``p50``/``p95`` are
+nearest-rank percentiles. Inputs come from fixed seeds, and every case
+runs one untimed warm-up first. Differences of a few percent are within
+run-to-run noise; compare runs from the same, otherwise idle machine.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import math
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from importlib import metadata
+from pathlib import Path
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from tenacity import wait_none
+
+from app.core.config import settings
+from app.db import models  # noqa: F401  (registers the tables on Base.metadata)
+from app.db.base import Base
+from app.dnb.marc import parse_marcxml_record
+from app.dnb.sru_client import SruClient
+from app.ingest import downloader, url_safety
+from app.ingest.downloader import RateLimited, download_to_minio
+from app.ingest.http import close_http_client
+from app.ingest.storage import close_minio_client
+from benchmarks.corpus import make_corpus
+from benchmarks.servers import MockSruServer, OriginServer, S3StandIn, body_sha256
+
+SCHEMA_VERSION = 1
+RESULTS_DIR = Path(__file__).parent / "results"
+_MiB = 1024 * 1024
+
+Results = dict[str, dict[str, float]]
+
+
+def _percentile(sorted_samples: list[float], q: float) -> float:
+    return sorted_samples[max(0, math.ceil(q * len(sorted_samples)) - 1)]
+
+
+def summarize(samples: list[float], *, items: int | None = None, nbytes: int = 0, unit: str = "ops") -> dict[str, float]:
+    """Latency percentiles (ms) and throughput for per-operation ``samples`` in seconds."""
+    s = sorted(samples)
+    total = sum(s)
+    out = {
+        "count": len(s),
+        "p50_ms": _percentile(s, 0.50) * 1000,
+        "p95_ms": _percentile(s, 0.95) * 1000,
+        "max_ms": s[-1] * 1000,
+        f"{unit}_per_sec": (items if items is not None else len(s)) / total,
+    }
+    if nbytes:
+        out["mb_per_sec"] = nbytes / _MiB / total
+    return out
+
+
+def _timed(fn: Callable[[], object]) -> tuple[float, object]:
+    t0 = time.perf_counter()
+    value = fn()
+    return time.perf_counter() - t0, value
+
+
+# --- Parsing ---
+
+
+def bench_parse(args: argparse.Namespace) -> Results:
+    corpus = make_corpus(args.records)
+    for marcxml in corpus[:100]:
+        parse_marcxml_record(marcxml)
+
+    best = math.inf
+    for _ in range(args.repeat):
+        gc.collect()
+        elapsed, _ = _timed(lambda: [parse_marcxml_record(x) for x in corpus])
+        best = min(best, elapsed)
+    return {
+        "parse.marcxml_record": {
+            "count": len(corpus),
+            "records_per_sec": len(corpus) / best,
+            "per_record_us": best / len(corpus) * 1e6,
+        }
+    }
+
+
+# --- /search: SRU fetch + parse + upsert ---
+
+
+@contextmanager
+def _database(dsn: str | None) -> Iterator[sessionmaker]:
+    tmpdir = None
+    if dsn is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        dsn = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+    engine = create_engine(dsn)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    try:
+        yield sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    finally:
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+
+async def _search_pages(args: argparse.Namespace, sru: MockSruServer, SessionLocal: sessionmaker) -> Results:
+    # Imported late: the route module pulls in Celery and the app's engine.
+    from app.api.routes import _store_search_page
+
+    page_size = args.page_size
+    starts = list(range(1, args.pages * page_size + 1, page_size))
+    for start in starts:
+        sru.page(start, page_size)  # build bodies up front; serving them is then ~free
+
+    results: Results = {}
+    async with SruClient(base_url=f"{sru.url}/sru") as client:
+        await client.search("bench", start_record=1, maximum_records=page_size, use_cache=False)
+
+        # Pass 1 inserts every record, pass 2 updates them all.
+        for phase in ("insert", "update"):
+            fetch: list[float] = []
+            store: list[float] = []
+            n = 0
+            for start in starts:
+                t0 = time.perf_counter()
+                res = await client.search("bench", start_record=start, maximum_records=page_size, use_cache=False)
+                t1 = time.perf_counter()
+                with SessionLocal() as db:
+                    _store_search_page(db, res)
+                fetch.append(t1 - t0)
+                store.append(time.perf_counter() - t1)
+                n += len(res.records)
+            if phase == "insert":
+                results["search.sru_fetch"] = summarize(fetch, items=n, unit="records")
+            results[f"search.store_page.{phase}"] = summarize(store, items=n, unit="records")
+            results[f"search.end_to_end.{phase}"] = summarize(
+                [f + s for f, s in zip(fetch, store)], items=n, unit="records"
+            )
+    return results
+
+
+def bench_search(args: argparse.Namespace) -> Results:
+    with MockSruServer(args.pages * args.page_size, latency=args.sru_latency) as sru, _database(args.dsn) as SessionLocal:
+        return asyncio.run(_search_pages(args, sru, SessionLocal))
+
+
+# --- Asset downloads into object storage ---
+
+
+@contextmanager
+def _local_storage(s3: S3StandIn) -> Iterator[None]:
+    """Point the app's MinIO client at ``s3`` and let downloads reach loopback origins."""
+    overrides = {
+        "s3_endpoint": f"127.0.0.1:{s3.port}",
+        "s3_secure": False,
+        "s3_region": "us-east-1",
+        "s3_bucket": "bench",
+    }
+    saved = {k: getattr(settings, k) for k in overrides}
+    is_bad_ip = url_safety._is_bad_ip
+    for k, v in overrides.items():
+        setattr(settings, k, v)
+    close_minio_client()
+    close_http_client()
+    url_safety.resolver.clear()
+    try:
+        # Benchmark only: the SSRF check would refuse 127.0.0.1.
+        with mock.patch.object(url_safety, "_is_bad_ip", lambda ip: ip != "127.0.0.1" and is_bad_ip(ip)):
+            yield
+    finally:
+        for k, v in saved.items():
+            setattr(settings, k, v)
+        close_minio_client()
+        close_http_client()
+        url_safety.resolver.clear()
+
+
+def _download_case(
+    s3: S3StandIn, name: str, url: str, size: int, repeat: int, *, content_addressed: bool = False
+) -> dict[str, float]:
+    expected = body_sha256(size)
+
+    def once(i: int) -> None:
+        key = None if content_addressed else f"bench/{name}/{i}"
+        res = download_to_minio(url, key)
+        if res.sha256 != expected or res.size_bytes != size:
+            raise AssertionError(f"{name}: wrong body ({res.size_bytes} bytes, sha256 {res.sha256})")
+        stored = s3.objects.get((settings.s3_bucket, res.storage_key))
+        if stored is None or stored.sha256 != expected:
+            raise AssertionError(f"{name}: object {res.storage_key} missing or corrupt in the S3 stand-in")
+
+    once(-1)
+    samples = []
+    for i in range(repeat):
+        gc.collect()
+        elapsed, _ = _timed(lambda: once(i))
+        samples.append(elapsed)
+    return summarize(samples, nbytes=size * repeat)
+
+
+def _rate_limited_case(origin: OriginServer, repeat: int) -> dict[str, float]:
+    url = f"{origin.url}/limited?retry_after=5"
+
+    def once() -> None:
+        try:
+            download_to_minio(url, "bench/limited")
+        except RateLimited:
+            return
+        raise AssertionError("429 was not reported as RateLimited")
+
+    once()
+    return summarize([_timed(once)[0] for _ in range(repeat)])
+
+
+def _resume_case(origin: OriginServer, s3: S3StandIn, repeat: int) -> dict[str, float]:
+    """Every response breaks off after 3 MiB of 8 MiB; retries resume with ``Range``."""
+    size = 8 * _MiB
+    url = f"{origin.url}/bytes/{size}?cut={3 * _MiB}"
+    before = origin.bytes_sent
+    # Without the backoff sleeps the time is transfer and resume overhead.
+    with mock.patch.object(downloader, "wait_exponential", lambda **kwargs: wait_none()):
+        res = _download_case(s3, "resume", url, size, repeat)
+    res["origin_bytes_per_body"] = (origin.bytes_sent - before) / (size * (repeat + 1))
+    return res
+
+
+def bench_download(args: argparse.Namespace) -> Results:
+    scale = 4 if args.quick else 1
+    large = min(32 * _MiB, settings.max_download_bytes)
+    cases = [
+        # name, path, size, repeat
+        ("small", "bytes", 64 * 1024, 200 // scale),
+        ("large", "bytes", large, max(1, 4 // scale)),
+        ("chunked", "chunked", 8 * _MiB, 8 // scale),
+    ]
+    results: Results = {}
+    with OriginServer() as origin, S3StandIn() as s3, _local_storage(s3):
+        for name, route, size, repeat in cases:
+            url = f"{origin.url}/{route}/{size}"
+            results[f"download.{name}"] = _download_case(s3, name, url, size, repeat)
+
+        # Paced origin: the floor is size / rate (250 ms here); the rest is ours.
+        rate = 8 * _MiB
+        url = f"{origin.url}/slow/{2 * _MiB}?rate={rate}"
+        results["download.slow"] = _download_case(s3, "slow", url, 2 * _MiB, max(1, 4 // scale))
+
+        # Same body every time: all but the warm-up skip the upload.
+        url = f"{origin.url}/bytes/{8 * _MiB}"
+        with mock.patch.object(settings, "s3_content_addressed", True):
+            results["download.content_addressed"] = _download_case(
+                s3, "content_addressed", url, 8 * _MiB, 8 // scale, content_addressed=True
+            )
+
+        results["download.resume"] = _resume_case(origin, s3, 8 // scale)
+        results["download.rate_limited"] = _rate_limited_case(origin, 100 // scale)
+    return results
+
+
+# --- Runner ---
+
+BENCHES: dict[str, Callable[[argparse.Namespace], Results]] = {
+    "parse": bench_parse,
+    "search": bench_search,
+    "download": bench_download,
+}
+
+
+def _git(*args: str) -> str | None:
+    try:
+        out = subprocess.run(["git", *args], capture_output=True, text=True, check=True, cwd=Path(__file__).parent)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def _environment() -> dict:
+    packages = {}
+    for name in ("lxml", "SQLAlchemy", "httpx", "minio", "zstandard"):
+        try:
+            packages[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            packages[name] = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "packages": packages,
+    }
+
+
+def _print_results(results: Results) -> None:
+    for case, metrics in results.items():
+        parts = [f"{k} {v:,.1f}" if isinstance(v, float) else f"{k} {v}" for k, v in metrics.items()]
+        print(f"{case:<30} " + "  ".join(parts))
+
+
+def _direction(metric: str) -> int:
+    if metric == "max_ms":  # a single outlier; too noisy to compare
+        return 0
+    if metric.endswith("_per_sec"):
+        return 1
+    if metric.endswith(("_ms", "_us")):
+        return -1
+    return 0
+
+
+def compare(baseline: dict, current: dict, *, threshold: float) -> None:
+    if baseline.get("params") != current.get("params"):
+        print("warning: parameters differ from the baseline; numbers are not comparable")
+    print(f"\nvs {baseline.get('commit_short') or '?'} ({baseline.get('created_at', '?')}); threshold {threshold:.0%}")
+    for case, metrics in current["results"].items():
+        old_metrics = baseline.get("results", {}).get(case)
+        if old_metrics is None:
+            print(f"{case:<30} (new)")
+            continue
+        for metric, new in metrics.items():
+            sign = _direction(metric)
+            old = old_metrics.get(metric)
+            if not sign or not old:
+                continue
+            change = (new - old) / old
+            verdict = ""
+            if abs(change) >= threshold:
+                verdict = "better" if change * sign > 0 else "WORSE"
+            print(f"{case:<30} {metric:<16} {old:12,.2f} -> {new:12,.2f}  {change:+7.1%}  {verdict}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--only", default=",".join(BENCHES), help="comma-separated subset of: " + ", ".join(BENCHES))
+    ap.add_argument("--quick", action="store_true", help="smaller inputs, for a smoke run")
+    ap.add_argument("--dsn", default=None, help="SQLAlchemy URL for the search bench (default: temporary SQLite file)")
+    ap.add_argument("--records", type=int, default=None, help="parse bench corpus size (default 5000)")
+    ap.add_argument("--pages", type=int, default=None, help="search bench pages (default 20)")
+    ap.add_argument("--page-size", type=int, default=100)
+    ap.add_argument("--sru-latency", type=float, default=0.0, help="seconds the mock SRU server waits per response")
+    ap.add_argument("--repeat", type=int, default=5, help="parse bench repetitions (best is reported)")
+    ap.add_argument("--out", type=Path, default=None, help="result file (default benchmarks/results/<commit>.json)")
+    ap.add_argument("--compare", type=Path, default=None, help="earlier result file to compare against")
+    ap.add_argument("--threshold", type=float, default=0.05, help="relative change flagged by --compare")
+    args = ap.parse_args()
+
+    args.records = args.records or (1000 if args.quick else 5000)
+    args.pages = args.pages or (5 if args.quick else 20)
+    selected = [b.strip() for b in args.only.split(",") if b.strip()]
+    unknown = set(selected) - set(BENCHES)
+    if unknown:
+        ap.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    commit = _git("rev-parse", "HEAD")
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    params = {
+        k: v for k, v in vars(args).items() if k not in {"out", "compare", "threshold", "dsn"}
+    }
+    params["database"] = "sqlite" if args.dsn is None else args.dsn.split(":", 1)[0]
+
+    results: Results = {}
+    for name in selected:
+        print(f"== {name}")
+        bench_results = BENCHES[name](args)
+        _print_results(bench_results)
+        results.update(bench_results)
+
+    report = {
+        "schema": SCHEMA_VERSION,
+        "commit": commit,
+        "commit_short": commit[:10] if commit else None,
+        "dirty": dirty,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": _environment(),
+        "params": params,
+        "results": results,
+    }
+    out = args.out
+    if out is None:
+        out = RESULTS_DIR / f"{report['commit_short'] or 'unknown'}{'-dirty' if dirty else ''}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nwrote {out}")
+
+    if args.compare is not None:
+        compare(json.loads(args.compare.read_text()), report, threshold=args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Initial schema, exactly as the former create_all() bootstrap created it.
+
+Databases from that bootstrap are stamped at this revision (see
+app.db.init_db), so it must not contain anything added later.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-16
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('jobs',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('status', sa.String(length=32), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('records',
+    sa.Column('idn', sa.String(length=64), nullable=False),
+    sa.Column('title', sa.String(length=1024), nullable=True),
+    sa.Column('year', sa.Integer(), nullable=True),
+    sa.Column('raw_marcxml', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('idn')
+    )
+    op.create_table('links',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('record_idn', sa.String(length=64), nullable=False),
+    sa.Column('url', sa.Text(), nullable=False),
+    sa.Column('label', sa.String(length=512), nullable=True),
+    sa.Column('description', sa.String(length=512), nullable=True),
+    sa.Column('kind', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['record_idn'], ['records.idn'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('record_idn', 'url', name='uq_record_url')
+    )
+    op.create_table('assets',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('link_id', sa.String(length=36), nullable=False),
+    sa.Column('status', sa.String(length=32), nullable=False),
+    sa.Column('storage_key', sa.String(length=1024), nullable=True),
+    sa.Column('sha256', sa.String(length=64), nullable=True),
+    sa.Column('mime_type', sa.String(length=255), nullable=True),
+    sa.Column('size_bytes', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['link_id'], ['links.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('job_items',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('job_id', sa.String(length=36), nullable=False),
+    sa.Column('asset_id', sa.String(length=36), nullable=False),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('job_id', 'asset_id', name='uq_job_asset')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('job_items')
+    op.drop_table('assets')
+    op.drop_table('links')
+    op.drop_table('records')
+    op.drop_table('jobs')
@@ -0,0 +1,103 @@
+"""Tables and columns the ingest pipeline added on top of the initial schema.
+
+Harvests, content-addressed blobs, per-host throttling, job progress
+counters and the job_items.asset_id index. Before, these were part of 0001,
+so databases stamped at 0001 never got them.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+_JOB_COUNTERS = [
+    ('total', sa.Integer()),
+    ('queued', sa.Integer()),
+    ('downloading', sa.Integer()),
+    ('done', sa.Integer()),
+    ('failed', sa.Integer()),
+    ('total_bytes', sa.BigInteger()),
+]
+
+
+def upgrade() -> None:
+    op.create_table('blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('storage_key', sa.String(length=1024), nullable=False),
+    sa.Column('size_bytes', sa.Integer(), nullable=False),
+    sa.Column('mime_type', sa.String(length=255), nullable=True),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_table('harvests',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('cql', sa.Text(), nullable=False),
+    sa.Column('max_records', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=32), nullable=False),
+    sa.Column('number_of_records', sa.Integer(), nullable=True),
+    sa.Column('records_harvested', sa.Integer(), nullable=False),
+    sa.Column('records_failed', sa.Integer(), nullable=False),
+    sa.Column('records_per_sec', sa.Float(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('host_throttles',
+    sa.Column('host', sa.String(length=255), nullable=False),
+    sa.Column('rate', sa.Float(), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('refilled_at', sa.Float(), nullable=False),
+    sa.Column('blocked_until', sa.Float(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('host')
+    )
+    op.create_table('host_leases',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('host', sa.String(length=255), nullable=False),
+    sa.Column('expires_at', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['host'], ['host_throttles.host'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_host_leases_host', 'host_leases', ['host'])
+
+    # Existing jobs start at zero; the default only fills in those rows.
+    with op.batch_alter_table('jobs') as batch_op:
+        for name, type_ in _JOB_COUNTERS:
+            batch_op.add_column(sa.Column(name, type_, nullable=False, server_default='0'))
+    with op.batch_alter_table('jobs') as batch_op:
+        for name, _ in _JOB_COUNTERS:
+            batch_op.alter_column(name, server_default=None)
+
+    # Batch mode: SQLite cannot add the foreign key with ALTER TABLE.
+    with op.batch_alter_table('assets') as batch_op:
+        batch_op.add_column(sa.Column('blob_sha256', sa.String(length=64), nullable=True))
+        batch_op.create_foreign_key('fk_assets_blob_sha256', 'blobs', ['blob_sha256'], ['sha256'])
+
+    op.create_index('ix_job_items_asset_id', 'job_items', ['asset_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_job_items_asset_id', table_name='job_items')
+    with op.batch_alter_table('assets') as batch_op:
+        batch_op.drop_constraint('fk_assets_blob_sha256', type_='foreignkey')
+        batch_op.drop_column('blob_sha256')
+    with op.batch_alter_table('jobs') as batch_op:
+        for name, _ in reversed(_JOB_COUNTERS):
+            batch_op.drop_column(name)
+    op.drop_index('ix_host_leases_host', table_name='host_leases')
+    op.drop_table('host_leases')
+    op.drop_table('host_throttles')
+    op.drop_table('harvests')
+    op.drop_table('blobs')
@@ -0,0 +1,35 @@
+"""Indexes for GET /records (keyset order, link kind and asset status filters).
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+"""
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+_INDEXES = [
+    ('ix_records_year_idn', 'records', ['year', 'idn']),
+    ('ix_links_record_kind', 'links', ['record_idn', 'kind']),
+    ('ix_assets_link_status', 'assets', ['link_id', 'status']),
+    ('ix_assets_status', 'assets', ['status']),
+]
+
+
+def upgrade() -> None:
+    # On Postgres, build without locking out writes; CONCURRENTLY cannot run in a transaction.
+    with op.get_context().autocommit_block():
+        for name, table, columns in _INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
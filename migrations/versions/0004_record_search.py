@@ -0,0 +1,85 @@
+"""Local full-text search: records.creators, records.search_vector and its index.
+
+Postgres gets a GIN-indexed tsvector column, SQLite the records_fts FTS5
+table. Existing rows are indexed from their title and link text; creators
+fill in as records are harvested again.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+# The DDL as of this revision; app.db.models keeps its own copy for create_all().
+_RECORDS_FTS_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS records_fts "
+    "USING fts5(idn UNINDEXED, title, creators, links, tokenize='unicode61 remove_diacritics 2')"
+)
+_RECORDS_FTS_DROP = "DROP TABLE IF EXISTS records_fts"
+
+
+def upgrade() -> None:
+    op.add_column('records', sa.Column('creators', sa.JSON(), nullable=True))
+    op.add_column(
+        'records',
+        sa.Column('search_vector', postgresql.TSVECTOR().with_variant(sa.Text(), 'sqlite'), nullable=True),
+    )
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # Deployment setting, not code: the vectors must match what the API queries with.
+        cfg = settings.search_text_config
+        op.execute(
+            f"""
+            UPDATE records r SET search_vector =
+                setweight(to_tsvector('{cfg}'::regconfig, coalesce(r.title, '')), 'A')
+                || setweight(to_tsvector('{cfg}'::regconfig, coalesce((
+                    SELECT string_agg(concat_ws(' ', l.label, l.description), ' ')
+                    FROM links l WHERE l.record_idn = r.idn
+                ), '')), 'C')
+            """
+        )
+        with op.get_context().autocommit_block():
+            op.create_index(
+                'ix_records_search_vector',
+                'records',
+                ['search_vector'],
+                postgresql_using='gin',
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+    elif op.get_bind().dialect.name == 'sqlite':
+        op.execute(_RECORDS_FTS_CREATE)
+        op.execute(
+            """
+            INSERT INTO records_fts (idn, title, creators, links)
+            SELECT r.idn, coalesce(r.title, ''), '', coalesce((
+                SELECT group_concat(trim(coalesce(l.label, '') || ' ' || coalesce(l.description, '')), ' ')
+                FROM links l WHERE l.record_idn = r.idn
+            ), '')
+            FROM records r
+            """
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index('ix_records_search_vector', table_name='records', postgresql_concurrently=True, if_exists=True)
+    elif op.get_bind().dialect.name == 'sqlite':
+        op.execute(_RECORDS_FTS_DROP)
+    with op.batch_alter_table('records') as batch_op:
+        batch_op.drop_column('search_vector')
+        batch_op.drop_column('creators')
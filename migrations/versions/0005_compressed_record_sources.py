@@ -0,0 +1,119 @@
+"""Move raw MARCXML out of records into compressed record_sources.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16
+"""
+from __future__ import annotations
+
+import gzip
+
+from alembic import context, op
+from alembic.util import CommandError
+import sqlalchemy as sa
+
+try:
+    import zstandard
+except ImportError:  # gzip only
+    zstandard = None
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+_BATCH = 1000
+# Fixed here rather than taken from app.db.compression, so this revision
+# always writes the same thing. Both codecs are read by the app.
+_LEVEL = 6
+
+
+def _compress(value: str) -> tuple[str, bytes]:
+    raw = value.encode('utf-8')
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=_LEVEL).compress(raw)
+    return 'gzip', gzip.compress(raw, compresslevel=_LEVEL, mtime=0)
+
+
+def _decompress(codec: str, data: bytes) -> str:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('Stored MARCXML is zstd-compressed; install the zstandard package')
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    if codec == 'gzip':
+        return gzip.decompress(data).decode('utf-8')
+    raise ValueError(f'Unknown codec {codec!r}')
+
+_records = sa.table('records', sa.column('idn', sa.String), sa.column('raw_marcxml', sa.Text))
+_sources = sa.table(
+    'record_sources',
+    sa.column('idn', sa.String),
+    sa.column('codec', sa.String),
+    sa.column('data', sa.LargeBinary),
+    sa.column('raw_size', sa.Integer),
+)
+
+
+def _batches(bind, table, columns):
+    last = None
+    while True:
+        q = sa.select(*columns).order_by(table.c.idn).limit(_BATCH)
+        if last is not None:
+            q = q.where(table.c.idn > last)
+        rows = bind.execute(q).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+def _require_online() -> None:
+    # Compression runs in Python on the fetched rows; SQL alone cannot do it.
+    if context.is_offline_mode():
+        raise CommandError(
+            'Revision 0005 copies MARCXML through zstd/gzip in Python and cannot be '
+            'rendered with --sql. Generate the SQL up to 0004, then run '
+            '"alembic upgrade 0005" against the database, then use --sql from 0005 on.'
+        )
+
+
+def upgrade() -> None:
+    _require_online()
+    op.create_table('record_sources',
+    sa.Column('idn', sa.String(length=64), nullable=False),
+    sa.Column('codec', sa.String(length=16), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('raw_size', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['idn'], ['records.idn'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('idn')
+    )
+
+    bind = op.get_bind()
+    for rows in _batches(bind, _records, [_records.c.idn, _records.c.raw_marcxml]):
+        values = []
+        for idn, raw in rows:
+            codec, data = _compress(raw)
+            values.append({'idn': idn, 'codec': codec, 'data': data, 'raw_size': len(raw)})
+        bind.execute(_sources.insert(), values)
+
+    with op.batch_alter_table('records') as batch_op:
+        batch_op.drop_column('raw_marcxml')
+
+
+def downgrade() -> None:
+    _require_online()
+    with op.batch_alter_table('records') as batch_op:
+        batch_op.add_column(sa.Column('raw_marcxml', sa.Text(), nullable=False, server_default=''))
+
+    bind = op.get_bind()
+    columns = [_sources.c.idn, _sources.c.codec, _sources.c.data]
+    for rows in _batches(bind, _sources, columns):
+        bind.execute(
+            _records.update().where(_records.c.idn == sa.bindparam('b_idn')).values(raw_marcxml=sa.bindparam('b_raw')),
+            [{'b_idn': idn, 'b_raw': _decompress(codec, data)} for idn, codec, data in rows],
+        )
+
+    with op.batch_alter_table('records') as batch_op:
+        batch_op.alter_column('raw_marcxml', server_default=None)
+    op.drop_table('record_sources')
@@ -0,0 +1,29 @@
+"""jobs.harvest_id: ingest jobs that harvest their records first (POST /ingest/query).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Batch mode: SQLite cannot add the foreign key with ALTER TABLE.
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.add_column(sa.Column('harvest_id', sa.String(length=36), nullable=True))
+        batch_op.create_foreign_key('fk_jobs_harvest_id', 'harvests', ['harvest_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.drop_constraint('fk_jobs_harvest_id', type_='foreignkey')
+        batch_op.drop_column('harvest_id')
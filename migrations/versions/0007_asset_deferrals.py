@@ -0,0 +1,29 @@
+"""assets.deferrals: how often an asset was re-queued for a busy host.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-16
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('assets') as batch_op:
+        batch_op.add_column(sa.Column('deferrals', sa.Integer(), nullable=False, server_default='0'))
+    # The app sets it on insert; the server default only fills existing rows.
+    with op.batch_alter_table('assets') as batch_op:
+        batch_op.alter_column('deferrals', server_default=None)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('assets') as batch_op:
+        batch_op.drop_column('deferrals')
@@ -0,0 +1,29 @@
+"""blobs.deleting: blobs claimed by the garbage collector.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-16
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('blobs') as batch_op:
+        batch_op.add_column(sa.Column('deleting', sa.Boolean(), nullable=False, server_default=sa.false()))
+    # The app sets it on insert; the server default only fills existing rows.
+    with op.batch_alter_table('blobs') as batch_op:
+        batch_op.alter_column('deleting', server_default=None)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('blobs') as batch_op:
+        batch_op.drop_column('deleting')